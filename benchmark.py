@@ -0,0 +1,134 @@
+"""
+Training throughput benchmark. Trains a new tree for a fixed amount of rounds from a fixed seed and prints one JSON
+object, so runs before and after a change can be compared:
+
+    python benchmark.py 200 --seed 1 > before.json
+
+Counts are taken by wrapping the counted functions for the duration of the run, see instrumentation.Probes. The
+games of worker processes are not seen, so the benchmark trains in this process only.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import settings
+from instrumentation import Probes
+from chess import match as mch, playout, batch_playout
+from origin.node import Node
+from origin.origin import Origin
+from database.database import Database
+from database.writer import Writer
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process in bytes.
+    :rtype: int
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def benchmark(rounds, seed=0, sync=True, fast=settings.FAST_PLAYOUTS, batch=settings.BATCH_PLAYOUTS,
+              async_save=settings.ASYNC_SAVE):
+    """
+    Trains a new tree for given amount of rounds, saving every walk to a temporary database if sync, and returns
+    the throughput measured.
+    :param rounds: amount of training rounds
+    :param seed: seed of random, and so of NumPy's generators of the batched playouts
+    :param sync: saves every walk like main.dynamic_save if True
+    :param fast: plays the games with the playout engine of chess.playout, see settings.FAST_PLAYOUTS
+    :param batch: least amount of games played in lockstep, see settings.BATCH_PLAYOUTS
+    :param async_save: writes the walks from a background thread, see settings.ASYNC_SAVE
+    :type rounds: int
+    :type seed: int
+    :type sync: bool
+    :type fast: bool
+    :type batch: int
+    :type async_save: bool
+    :return: results by name, JSON serializable
+    :rtype: dict
+    """
+    random.seed(seed)
+    saved_settings = settings.FAST_PLAYOUTS, settings.BATCH_PLAYOUTS
+    settings.FAST_PLAYOUTS, settings.BATCH_PLAYOUTS = fast, batch
+    counters = Probes()
+    counters.count(Node, 'roll_out', 'rollouts')
+    counters.count(Node, 'expand', 'expansions')
+    counters.count(Origin, 'expand', 'root_expansions')
+    counters.count(mch.Match, '__init__', 'match_constructions')
+    counters.count(mch, 'random_games', 'games', lambda args, result: len(result))
+    counters.count(mch.Match, 'random_move', 'plies')
+    counters.count(playout.Playout, 'make_move', 'fast_plies')
+    if batch_playout.available:
+        counters.count(batch_playout.BatchPlayout, 'make_moves', 'batch_plies', lambda args, result: len(args[1]))
+    counters.time(Origin, 'save_walk', 'db_write')
+    counters.time(Origin, 'flush', 'db_flush')
+    directory = tempfile.mkdtemp()
+    origin = Origin()
+    fn = os.path.join(directory, 'nodes.db')
+    origin.database = Writer(origin, fn=fn) if async_save else Database(origin, fn=fn)
+    try:
+        before = time.perf_counter()
+        for rnd in range(rounds):
+            origin.train()
+            if sync:
+                origin.save_walk()
+        origin.flush()
+        seconds = time.perf_counter() - before
+    finally:
+        counters.restore()
+        settings.FAST_PLAYOUTS, settings.BATCH_PLAYOUTS = saved_settings
+        origin.close()
+        os.remove(fn)
+        os.rmdir(directory)
+
+    db_seconds = counters.seconds['db_write'] + counters.seconds['db_flush']
+    train_seconds = seconds - db_seconds
+    expansions = counters.calls['expansions'] + counters.calls['root_expansions']
+    plies = counters.calls['plies'] + counters.calls['fast_plies'] + counters.calls.get('batch_plies', 0)
+    return {
+        'rounds': rounds,
+        'seed': seed,
+        'sync': sync,
+        'fast': fast,
+        'batch': batch,
+        'async_save': async_save,
+        'num_simulations': settings.NUM_SIMULATIONS,
+        'seconds': seconds,
+        'train_seconds': train_seconds,
+        'rounds_per_second': rounds / seconds if seconds else 0,
+        'rollouts': counters.calls['rollouts'],
+        'rollouts_per_second': counters.calls['rollouts'] / train_seconds if train_seconds else 0,
+        'games': counters.calls['games'],
+        'expansions': expansions,
+        'expansions_per_second': expansions / train_seconds if train_seconds else 0,
+        'match_constructions': counters.calls['match_constructions'],
+        'mean_playout_length': plies / counters.calls['games'] if counters.calls['games'] else 0,
+        'db_write_seconds': db_seconds,
+        'peak_rss_bytes': peak_rss(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trains a new tree and prints its throughput as JSON.')
+    parser.add_argument('rounds', type=int, nargs='?', default=100, help='amount of training rounds')
+    parser.add_argument('--seed', type=int, default=0, help='seed of random')
+    parser.add_argument('--no-sync', dest='sync', action='store_false', help='does not save the walks')
+    parser.add_argument('--fast', action='store_true', default=settings.FAST_PLAYOUTS,
+                        help='plays the games with the playout engine of chess.playout')
+    parser.add_argument('--batch', type=int, default=settings.BATCH_PLAYOUTS,
+                        help='least amount of games played in lockstep, 0 never does')
+    parser.add_argument('--async-save', action='store_true', default=settings.ASYNC_SAVE,
+                        help='writes the walks from a background thread')
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.rounds, args.seed, args.sync, args.fast, args.batch, args.async_save), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Precomputed per square move and attack tables, indexed by integer square (row * 8 + column).
+Move lists are shared between callers and must not be modified.
+"""
+
+DIRECTIONS = ('u', 'd', 'r', 'l', 'tl', 'br', 'tr', 'bl')
+ROOK_DIRECTIONS = ('u', 'd', 'r', 'l')
+BISHOP_DIRECTIONS = ('tr', 'tl', 'br', 'bl')
+QUEEN_DIRECTIONS = ('tr', 'tl', 'br', 'bl', 'u', 'd', 'r', 'l')
+
+DIRECTION_OFFSETS = {'u': (1, 0), 'd': (-1, 0), 'r': (0, 1), 'l': (0, -1),
+                     'tl': (-1, -1), 'br': (1, 1), 'tr': (-1, 1), 'bl': (1, -1)}
+STEPS = {direction: offset[0] * 8 + offset[1] for direction, offset in DIRECTION_OFFSETS.items()}
+
+KING_OFFSETS = ((1, 1), (-1, 1), (1, -1), (-1, -1), (0, 1), (0, -1), (1, 0), (-1, 0))
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2))
+PAWN_CAPTURE_OFFSETS = {'white': ((-1, -1), (-1, 1)), 'black': ((1, -1), (1, 1))}
+
+
+def _offset_moves(offsets):
+    """
+    Returns for every square the tuple of on board locations reached by adding each offset.
+    :param offsets: (row, column) offsets
+    :type offsets: tuple
+    :rtype: tuple
+    """
+    table = []
+    for sq in range(64):
+        row, col = sq >> 3, sq & 7
+        table.append(tuple((row + r, col + c) for r, c in offsets if 0 <= row + r < 8 and 0 <= col + c < 8))
+    return tuple(table)
+
+
+def _ray_moves():
+    """
+    Returns for every square a dict with the locations of each direction, ordered by distance.
+    :rtype: tuple
+    """
+    table = []
+    for sq in range(64):
+        rays = {}
+        for direction in DIRECTIONS:
+            r, c = DIRECTION_OFFSETS[direction]
+            row, col = (sq >> 3) + r, (sq & 7) + c
+            moves = []
+            while 0 <= row < 8 and 0 <= col < 8:
+                moves.append((row, col))
+                row, col = row + r, col + c
+            rays[direction] = moves
+        table.append(rays)
+    return tuple(table)
+
+
+def _mask(locations):
+    """
+    Returns the 64 bit mask of given locations.
+    :type locations: iterable
+    :rtype: int
+    """
+    mask = 0
+    for row, col in locations:
+        mask |= 1 << (row * 8 + col)
+    return mask
+
+
+KING_MOVES = _offset_moves(KING_OFFSETS)
+KNIGHT_MOVES = _offset_moves(KNIGHT_OFFSETS)
+PAWN_CAPTURE_MOVES = {color: _offset_moves(offsets) for color, offsets in PAWN_CAPTURE_OFFSETS.items()}
+RAY_MOVES = _ray_moves()
+
+RAYS = {direction: tuple(_mask(RAY_MOVES[sq][direction]) for sq in range(64)) for direction in DIRECTIONS}
+
+
+def _between():
+    """
+    Returns for every pair of squares on one line the mask of the squares strictly between them, 0 otherwise.
+    :rtype: tuple
+    """
+    table = [[0] * 64 for sq in range(64)]
+    for sq in range(64):
+        for direction in DIRECTIONS:
+            for row, col in RAY_MOVES[sq][direction]:
+                target = row * 8 + col
+                table[sq][target] = RAYS[direction][sq] & ~RAYS[direction][target] & ~(1 << target)
+    return tuple(tuple(row) for row in table)
+
+
+BETWEEN = _between()
+
+
+def ray_moves(sq, direction, own, occupied):
+    """
+    Returns the legal locations of a sliding piece on sq in given direction, up to and including the first
+    opponent's piece, excluding the first own piece.
+    :param sq: square of the sliding piece
+    :param direction: one of DIRECTIONS
+    :param own: occupancy mask of the sliding piece's color
+    :param occupied: occupancy mask of both colors
+    :type sq: int
+    :type direction: str
+    :type own: int
+    :type occupied: int
+    :return: new list of locations ordered by distance
+    :rtype: list
+    """
+    moves = RAY_MOVES[sq][direction]
+    blockers = RAYS[direction][sq] & occupied
+    if not blockers:
+        return moves[:]
+    if STEPS[direction] > 0:
+        blocker = (blockers & -blockers).bit_length() - 1
+    else:
+        blocker = blockers.bit_length() - 1
+    distance = (blocker - sq) // STEPS[direction]
+    if own >> blocker & 1:
+        distance -= 1
+    return moves[:distance]
+
@@ -0,0 +1,361 @@
+"""
+Batched playouts. Plays many random games from one position in lockstep with NumPy: every game is a row of
+64 bit boards, one per side and piece type, and every ply of all games is generated, sampled and made with array
+operations over the rows, so the interpreter overhead of a move is paid once per ply instead of once per game.
+
+Rules and random policy are those of Match and chess.playout: a move is picked uniformly among all legal moves.
+Bit i of a bit board is square i of the 64 square mailbox of chess.playout, square = row * 8 + column.
+
+NumPy is optional, available is False without it and random_games should not be called.
+"""
+from random import getrandbits
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+available = np is not None and hasattr(np, 'bitwise_count')
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_TYPES = {'P': PAWN, 'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+WHITE, BLACK = 0, 1
+KS, QS = 0, 1
+ONGOING, WHITE_WON, BLACK_WON, DRAWN = 0, 1, 2, 3
+WINNERS = {ONGOING: None, WHITE_WON: 'white', BLACK_WON: 'black', DRAWN: None}
+MAX_BATCH = 4096
+
+FILE_0 = 0x0101010101010101
+FILE_1 = FILE_0 << 1
+FILE_6 = FILE_0 << 6
+FILE_7 = FILE_0 << 7
+ALL = 0xFFFFFFFFFFFFFFFF
+# (shift, mask of squares a shifted piece may land on), orthogonal directions first like chess.playout
+DIRECTION_STEPS = ((8, ALL), (-8, ALL), (1, ALL ^ FILE_0), (-1, ALL ^ FILE_7),
+                   (9, ALL ^ FILE_0), (-9, ALL ^ FILE_7), (-7, ALL ^ FILE_0), (7, ALL ^ FILE_7))
+KNIGHT_STEPS = ((17, ALL ^ FILE_0), (15, ALL ^ FILE_7), (10, ALL ^ FILE_0 ^ FILE_1), (6, ALL ^ FILE_6 ^ FILE_7),
+                (-6, ALL ^ FILE_0 ^ FILE_1), (-10, ALL ^ FILE_6 ^ FILE_7), (-15, ALL ^ FILE_0), (-17, ALL ^ FILE_7))
+PAWN_CAPTURE_STEPS = {WHITE: ((-9, ALL ^ FILE_7), (-7, ALL ^ FILE_0)), BLACK: ((7, ALL ^ FILE_7), (9, ALL ^ FILE_0))}
+PAWN_PUSHES = {WHITE: (-8, 0xFF << 40), BLACK: (8, 0xFF << 16)}
+PROMOTION_ROWS = {WHITE: 0xFF, BLACK: 0xFF << 56}
+HOME_ROWS = {WHITE: 56, BLACK: 0}
+
+if available:
+    ZERO, ONE, FULL = np.uint64(0), np.uint64(1), np.uint64(ALL)
+
+
+def shift(bb, step, mask=ALL):
+    """
+    Shifts bit boards step squares, pieces crossing the board's edge are dropped by mask.
+    :type bb: numpy.ndarray
+    :type step: int
+    :type mask: int
+    :rtype: numpy.ndarray
+    """
+    bb = bb << np.uint64(step) if step > 0 else bb >> np.uint64(-step)
+    return bb if mask == ALL else bb & np.uint64(mask)
+
+
+def slide(bb, empty, direction):
+    """
+    Returns the squares the pieces of bb reach in given direction through empty squares, including the first
+    occupied square, by Kogge-Stone fills.
+    :param bb: bit boards of sliding pieces
+    :param empty: bit boards of the empty squares
+    :param direction: index of DIRECTION_STEPS
+    :type bb: numpy.ndarray
+    :type empty: numpy.ndarray
+    :type direction: int
+    :rtype: numpy.ndarray
+    """
+    step, mask = DIRECTION_STEPS[direction]
+    free = empty & np.uint64(mask)
+    bb = bb | (free & shift(bb, step))
+    free = free & shift(free, step)
+    bb = bb | (free & shift(bb, 2 * step))
+    free = free & shift(free, 2 * step)
+    bb = bb | (free & shift(bb, 4 * step))
+    return shift(bb, step, mask)
+
+
+def step_attacks(bb, steps):
+    """
+    Returns the squares reached from the pieces of bb in one of given steps.
+    :type bb: numpy.ndarray
+    :param steps: (shift, mask) pairs
+    :type steps: tuple
+    :rtype: numpy.ndarray
+    """
+    attacks = np.zeros_like(bb)
+    for step, mask in steps:
+        attacks |= shift(bb, step, mask)
+    return attacks
+
+
+def pawn_attacks(bb, side):
+    """
+    Returns the squares attacked by pawns of given sides on bb.
+    :param bb: bit boards of pawns
+    :param side: WHITE or BLACK for every bit board, broadcast against bb
+    :type bb: numpy.ndarray
+    :type side: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    return np.where(side == WHITE, step_attacks(bb, PAWN_CAPTURE_STEPS[WHITE]),
+                    step_attacks(bb, PAWN_CAPTURE_STEPS[BLACK]))
+
+
+class BatchPlayout:
+    """
+    Random games played in lockstep. pieces holds the bit boards of shape (games, side, piece type), finished
+    games are dropped from all arrays, games holds the index of every remaining row among the games started.
+    """
+    def __init__(self, board, turn, white_can_castle, black_can_castle, n, seed=None):
+        """
+        :param board: 8 x 8 board of piece keys like 'wP3', empty squares are 1, is not modified
+        :param turn: next side to move, 'black' or 'white'
+        :param white_can_castle: castling availability for white
+        :param black_can_castle: castling availability for black
+        :param n: amount of games
+        :param seed: seed of the games' random generator, drawn from random if None so random.seed applies
+        :type board: tuple, list
+        :type turn: str
+        :type white_can_castle: dict
+        :type black_can_castle: dict
+        :type n: int
+        :type seed: int
+        """
+        pieces = np.zeros((2, 6), dtype=np.uint64)
+        for i, row in enumerate(board):
+            for j, key in enumerate(row):
+                if key != 1:
+                    pieces[WHITE if key[0] == 'w' else BLACK, PIECE_TYPES[key[1]]] |= np.uint64(1 << (i * 8 + j))
+        can_castle = np.array([[white_can_castle['ks'], white_can_castle['qs']],
+                               [black_can_castle['ks'], black_can_castle['qs']]], dtype=bool)
+        self.pieces = np.repeat(pieces[None], n, axis=0)
+        self.can_castle = np.repeat(can_castle[None], n, axis=0)
+        self.side = np.full(n, WHITE if turn == 'white' else BLACK, dtype=np.intp)
+        self.continuous_non_capped_turns = np.zeros(n, dtype=np.intp)
+        self.games = np.arange(n)
+        self.results = np.full(n, ONGOING, dtype=np.int8)
+        self.random = np.random.default_rng(getrandbits(64) if seed is None else seed)
+
+    def legal_moves(self):
+        """
+        Generates the legal moves of the side to move of every game.
+        :return: piece bit board and piece type of every piece slot, shape (games, slots), and the legal moves of
+                 every slot grouped by direction, shape (games, slots, 8), pieces other than queens, rooks and bishops
+                 only use group 0. There are as many slots as pieces in the game with the most, empty slots have
+                 type -1 and no moves.
+        :rtype: tuple
+        """
+        side = self.side
+        rows = np.arange(len(side))
+        own_pieces = self.pieces[rows, side]
+        opp_pieces = self.pieces[rows, 1 - side]
+        own = np.bitwise_or.reduce(own_pieces, axis=1)
+        opp = np.bitwise_or.reduce(opp_pieces, axis=1)
+        empty = ~(own | opp)
+        king = own_pieces[:, KING]
+        orthogonal = opp_pieces[:, ROOK] | opp_pieces[:, QUEEN]
+        diagonal = opp_pieces[:, BISHOP] | opp_pieces[:, QUEEN]
+        sliders = (orthogonal,) * 4 + (diagonal,) * 4
+
+        near = (pawn_attacks(opp_pieces[:, PAWN], 1 - side) | step_attacks(opp_pieces[:, KNIGHT], KNIGHT_STEPS) |
+                step_attacks(opp_pieces[:, KING], DIRECTION_STEPS))
+        # the king is left out so it can not step back along the line of a slider checking it
+        attacked = near.copy()
+        for direction in range(8):
+            attacked |= slide(sliders[direction], empty | king, direction)
+
+        block = (step_attacks(king, KNIGHT_STEPS) & opp_pieces[:, KNIGHT]) | (pawn_attacks(king, side) &
+                                                                              opp_pieces[:, PAWN])
+        checkers = np.bitwise_count(block).astype(np.intp)
+        pinned, lines = [], []
+        for direction in range(8):
+            ray = slide(king, empty, direction)
+            check = (ray & sliders[direction]) != 0
+            checkers += check
+            block |= np.where(check, ray, ZERO)
+            blocker = ray & own
+            x_ray = slide(blocker, empty, direction)
+            pinned.append(np.where((x_ray & sliders[direction]) != 0, blocker, ZERO))
+            lines.append(ray | x_ray)
+        allowed = np.where(checkers == 0, FULL, np.where(checkers == 1, block, ZERO)) & ~own
+
+        slots = np.zeros((len(side), int(np.bitwise_count(own).max(initial=0))), dtype=np.uint64)
+        remaining = own.copy()
+        for slot in range(slots.shape[1]):
+            lowest = remaining & (~remaining + ONE)
+            slots[:, slot] = lowest
+            remaining ^= lowest
+        types = np.full(slots.shape, -1, dtype=np.intp)
+        for piece_type in range(6):
+            types[(slots & own_pieces[:, piece_type, None]) != 0] = piece_type
+        targets = np.repeat(allowed[:, None], slots.shape[1], axis=1)
+        for direction in range(8):
+            games = np.flatnonzero(pinned[direction])
+            if len(games):
+                slot = np.argmax(slots[games] == pinned[direction][games, None], axis=1)
+                targets[games, slot] &= lines[direction][games]
+
+        moves = np.zeros(slots.shape + (8,), dtype=np.uint64)
+        orthogonal_slots = (types == ROOK) | (types == QUEEN)
+        diagonal_slots = (types == BISHOP) | (types == QUEEN)
+        games, slot = np.nonzero(orthogonal_slots | diagonal_slots)
+        piece, free, piece_targets = slots[games, slot], empty[games], targets[games, slot]
+        for direction in range(8):
+            kind = (orthogonal_slots if direction < 4 else diagonal_slots)[games, slot]
+            moves[games, slot, direction] = np.where(kind, slide(piece, free, direction) & piece_targets, ZERO)
+        games, slot = np.nonzero(types == PAWN)
+        piece, free = slots[games, slot], empty[games]
+        pushes = []
+        for pawn_side in (WHITE, BLACK):
+            step, double_row = PAWN_PUSHES[pawn_side]
+            single = shift(piece, step) & free
+            pushes.append(single | (shift(single & np.uint64(double_row), step) & free))
+        pawn_moves = np.where(side[games] == WHITE, *pushes) | (pawn_attacks(piece, side[games]) & opp[games])
+        moves[games, slot, 0] = pawn_moves & targets[games, slot]
+        games, slot = np.nonzero(types == KNIGHT)
+        moves[games, slot, 0] = step_attacks(slots[games, slot], KNIGHT_STEPS) & targets[games, slot]
+
+        king_moves = step_attacks(king, DIRECTION_STEPS) & ~own & ~attacked
+        home = np.where(side == WHITE, HOME_ROWS[WHITE], HOME_ROWS[BLACK]).astype(np.uint64)
+        for flag, between, columns in ((KS, (5, 6), (6, 7, 5)), (QS, (3, 2, 1), (1, 0, 2))):
+            destination, rook_from, rook_to = (ONE << (home + np.uint64(col)) for col in columns)
+            occupied = np.zeros_like(king)
+            for col in between:
+                occupied |= ~empty & (ONE << (home + np.uint64(col)))
+            possible = self.can_castle[rows, side, flag] & (occupied == 0)
+            if not possible.any():
+                continue
+            moved = (empty | king | rook_from) & ~rook_to
+            threat = near & destination
+            for direction in range(8):
+                threat |= slide(destination, moved, direction) & sliders[direction]
+            king_moves |= np.where(possible & (threat == 0), destination, ZERO)
+        games, slot = np.nonzero(types == KING)
+        moves[games, slot, 0] = king_moves[games]
+        return slots, types, moves
+
+    def make_moves(self, from_bb, to_bb, piece_type):
+        """
+        Plays one move in every game, games reaching the 50th move in a row without a capture are drawn.
+        :param from_bb: bit board of the square moved from
+        :param to_bb: bit board of the square moved to
+        :param piece_type: type of the piece moved
+        :type from_bb: numpy.ndarray
+        :type to_bb: numpy.ndarray
+        :type piece_type: numpy.ndarray
+        """
+        side = self.side
+        rows = np.arange(len(side))
+        own_pieces = self.pieces[rows, side]
+        opp_pieces = self.pieces[rows, 1 - side]
+        captured = (np.bitwise_or.reduce(opp_pieces, axis=1) & to_bb) != 0
+        self.continuous_non_capped_turns = np.where(captured, 0, self.continuous_non_capped_turns + 1)
+        self.results[self.continuous_non_capped_turns == 50] = DRAWN
+
+        own_pieces[rows, piece_type] ^= from_bb | to_bb
+        opp_pieces &= ~to_bb[:, None]
+        promotion = np.where(side == WHITE, PROMOTION_ROWS[WHITE], PROMOTION_ROWS[BLACK]).astype(np.uint64)
+        promoted = np.where(piece_type == PAWN, to_bb & promotion, ZERO)
+        own_pieces[:, PAWN] ^= promoted
+        own_pieces[:, QUEEN] |= promoted
+        king = piece_type == KING
+        king_side = king & (to_bb == from_bb << np.uint64(2))
+        queen_side = king & (to_bb == from_bb >> np.uint64(3))
+        own_pieces[:, ROOK] ^= (np.where(king_side, shift(from_bb, 3) | shift(from_bb, 1), ZERO) |
+                                np.where(queen_side, shift(from_bb, -4) | shift(from_bb, -2), ZERO))
+        self.pieces[rows, side] = own_pieces
+        self.pieces[rows, 1 - side] = opp_pieces
+
+        for castle_side in (WHITE, BLACK):
+            home = HOME_ROWS[castle_side]
+            pieces = self.pieces[:, castle_side]
+            king_home = (pieces[:, KING] & np.uint64(1 << (home + 4))) != 0
+            self.can_castle[:, castle_side, KS] &= king_home & ((pieces[:, ROOK] & np.uint64(1 << (home + 7))) != 0)
+            self.can_castle[:, castle_side, QS] &= king_home & ((pieces[:, ROOK] & np.uint64(1 << home)) != 0)
+        bare = ((np.bitwise_count(np.bitwise_or.reduce(own_pieces, axis=1)) == 1) &
+                (np.bitwise_count(np.bitwise_or.reduce(opp_pieces, axis=1)) == 1))
+        self.results[bare] = DRAWN
+        self.side = 1 - side
+
+    def random_moves(self):
+        """
+        Plays a legal move picked uniformly in every game, games without legal moves are lost by the side to move.
+        """
+        slots, types, moves = self.legal_moves()
+        counts = np.bitwise_count(moves).reshape(len(slots), -1).astype(np.intp)
+        cumulative = np.cumsum(counts, axis=1)
+        totals = cumulative[:, -1]
+        stuck = totals == 0
+        self.results[stuck] = np.where(self.side[stuck] == WHITE, BLACK_WON, WHITE_WON)
+
+        rows = np.arange(len(slots))
+        picked = (self.random.random(len(slots)) * totals).astype(np.intp)
+        index = np.argmax(cumulative > picked[:, None], axis=1)
+        slot, group = np.divmod(index, moves.shape[2])
+        to_bb = moves[rows, slot, group]
+        skip = picked - (cumulative[rows, index] - counts[rows, index])
+        for n in range(int(skip.max(initial=0))):
+            to_bb = np.where(skip > n, to_bb & (to_bb - ONE), to_bb)
+        to_bb &= ~to_bb + ONE
+        ongoing = ~stuck
+        self.drop(stuck)
+        self.make_moves(slots[rows, slot][ongoing], to_bb[ongoing], types[rows, slot][ongoing])
+
+    def drop(self, finished):
+        """
+        Stores the results of the finished games and removes them from the arrays.
+        :param finished: boolean for every game
+        :type finished: numpy.ndarray
+        """
+        if not finished.any():
+            return
+        self.final[self.games[finished]] = self.results[finished]
+        ongoing = ~finished
+        for name in ('pieces', 'can_castle', 'side', 'continuous_non_capped_turns', 'games', 'results'):
+            setattr(self, name, getattr(self, name)[ongoing])
+
+    def simulate(self):
+        """
+        Plays the random games.
+        :return: winner of every game, None for draws
+        :rtype: list
+        """
+        self.final = np.full(len(self.games), DRAWN, dtype=np.int8)
+        side = self.side.copy()
+        self.side = 1 - side
+        slots, types, moves = self.legal_moves()
+        blocked = ~moves.any(axis=(1, 2))
+        self.side = side
+        self.random_moves()
+        # Match flags a side without moves at the start as lost, it takes effect after the first move.
+        self.results[(self.results == ONGOING) & blocked[self.games]] = (WHITE_WON if side[0] == WHITE else
+                                                                         BLACK_WON)
+        self.drop(self.results != ONGOING)
+        while len(self.games):
+            self.random_moves()
+            self.drop(self.results != ONGOING)
+        return [WINNERS[result] for result in self.final.tolist()]
+
+
+def random_games(board, turn, white_can_castle, black_can_castle, n, seed=None):
+    """
+    Plays n random chess games from given board in lockstep, returns their winners.
+    :param board: board to start the games from, is not modified
+    :param turn: next side to move, 'black' or 'white'
+    :param white_can_castle: castling availability for white
+    :param black_can_castle: castling availability for black
+    :param n: amount of games
+    :param seed: seed of the games' random generator, drawn from random if None
+    :type board: tuple[list]
+    :type turn: str
+    :type white_can_castle: dict
+    :type black_can_castle: dict
+    :type n: int
+    :type seed: int
+    :return: winner of every game
+    :rtype: list
+    """
+    return BatchPlayout(board, turn, white_can_castle, black_can_castle, n, seed).simulate()
@@ -0,0 +1,241 @@
+"""
+Bitboard position representation
+"""
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 0, 1, 2, 3, 4, 5
+COLORS = ('white', 'black')
+PIECE_CHARS = 'PNBRQK'
+NUMBERED_PIECES = (PAWN, KNIGHT, BISHOP, ROOK)
+SQUARE_MASKS = tuple(1 << sq for sq in range(64))
+
+
+def iter_squares(mask):
+    """
+    Yields the squares of all bits set in given mask, lowest square first.
+    :param mask: 64 bit occupancy mask
+    :type mask: int
+    :return: generator of squares
+    :rtype: generator
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Bitboard:
+    """
+    Chess position stored as 64 bit integers, one occupancy mask per piece type and one per color.
+    Bit n of a mask represents location (n // 8, n % 8) of Board().board.
+    """
+    def __init__(self, turn='white', wcks=True, wcqs=True, bcks=True, bcqs=True):
+        """
+        Creates an empty position.
+        :param turn: color allowed to move next
+        :param wcks: white can castle king's side
+        :param wcqs: white can castle queen's side
+        :param bcks: black can castle king's side
+        :param bcqs: black can castle queen's side
+        """
+        self.pieces = [0] * 6
+        self.colors = [0, 0]
+        self.turn = turn
+        self.white_can_castle = {'ks': wcks, 'qs': wcqs}
+        self.black_can_castle = {'ks': bcks, 'qs': bcqs}
+
+    @classmethod
+    def from_board(cls, board, turn='white', wcks=True, wcqs=True, bcks=True, bcqs=True):
+        """
+        Returns a Bitboard for given 8 x 8 board of piece keys like 'wP3'.
+        :param board: tuple or list of 8 lists, empty squares are 1
+        :param turn: color allowed to move next
+        :param wcks: white can castle king's side
+        :param wcqs: white can castle queen's side
+        :param bcks: black can castle king's side
+        :param bcqs: black can castle queen's side
+        :type board: tuple, list
+        :type turn: str
+        :rtype: Bitboard
+        """
+        bb = cls(turn, wcks, wcqs, bcks, bcqs)
+        pieces, colors = bb.pieces, bb.colors
+        for i, row in enumerate(board):
+            for j, sq in enumerate(row):
+                if sq == 1:
+                    continue
+                bit = SQUARE_MASKS[i * 8 + j]
+                colors[WHITE if sq[0] == 'w' else BLACK] |= bit
+                pieces[PIECE_CHARS.index(sq[1])] |= bit
+        return bb
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        Returns a Bitboard for given fen string, only the placement, turn and castling fields are used.
+        :param fen: fen string
+        :type fen: str
+        :rtype: Bitboard
+        """
+        fields = fen.split(' ')
+        castling = fields[2] if len(fields) > 2 else '-'
+        bb = cls('white' if fields[1] == 'w' else 'black',
+                 'K' in castling, 'Q' in castling, 'k' in castling, 'q' in castling)
+        for i, row in enumerate(fields[0].split('/')):
+            j = 0
+            for char in row:
+                if char.isdigit():
+                    j += int(char)
+                    continue
+                bb.put(i * 8 + j, WHITE if char.isupper() else BLACK, PIECE_CHARS.index(char.upper()))
+                j += 1
+        return bb
+
+    def copy(self):
+        """
+        Returns a copy of this position.
+        :rtype: Bitboard
+        """
+        bb = Bitboard(self.turn, self.white_can_castle['ks'], self.white_can_castle['qs'],
+                      self.black_can_castle['ks'], self.black_can_castle['qs'])
+        bb.pieces = self.pieces[:]
+        bb.colors = self.colors[:]
+        return bb
+
+    @property
+    def occupied(self):
+        """
+        Mask of all occupied squares.
+        :rtype: int
+        """
+        return self.colors[WHITE] | self.colors[BLACK]
+
+    def color_mask(self, color):
+        """
+        Returns the occupancy mask of given color.
+        :param color: either 'white' or 'black'
+        :type color: str
+        :rtype: int
+        """
+        return self.colors[WHITE if color == 'white' else BLACK]
+
+    def piece_at(self, sq):
+        """
+        Returns color and piece type on given square, None if empty.
+        :param sq: square in range(64)
+        :type sq: int
+        :return: (color, piece type) or None
+        :rtype: tuple, None
+        """
+        bit = SQUARE_MASKS[sq]
+        if self.colors[WHITE] & bit:
+            color = WHITE
+        elif self.colors[BLACK] & bit:
+            color = BLACK
+        else:
+            return None
+        for piece_type, mask in enumerate(self.pieces):
+            if mask & bit:
+                return color, piece_type
+
+    def put(self, sq, color, piece_type):
+        """
+        Places piece of given color and type on given square, the square must be empty.
+        :type sq: int
+        :type color: int
+        :type piece_type: int
+        """
+        bit = SQUARE_MASKS[sq]
+        self.colors[color] |= bit
+        self.pieces[piece_type] |= bit
+
+    def remove(self, sq):
+        """
+        Removes the piece on given square if there is one.
+        :type sq: int
+        """
+        keep = ~SQUARE_MASKS[sq]
+        colors, pieces = self.colors, self.pieces
+        colors[WHITE] &= keep
+        colors[BLACK] &= keep
+        for piece_type in range(6):
+            pieces[piece_type] &= keep
+
+    def move(self, from_sq, to_sq):
+        """
+        Moves the piece on from_sq to to_sq, a piece on to_sq is captured.
+        :type from_sq: int
+        :type to_sq: int
+        """
+        from_bit, to_bit = SQUARE_MASKS[from_sq], SQUARE_MASKS[to_sq]
+        colors, pieces = self.colors, self.pieces
+        if (colors[WHITE] | colors[BLACK]) & to_bit:
+            self.remove(to_sq)
+        both = from_bit | to_bit
+        color = WHITE if colors[WHITE] & from_bit else BLACK
+        colors[color] ^= both
+        for piece_type in range(6):
+            if pieces[piece_type] & from_bit:
+                pieces[piece_type] ^= both
+                break
+
+    def promote(self, sq, piece_type=QUEEN):
+        """
+        Replaces the pawn on given square by a piece of given type.
+        :type sq: int
+        :type piece_type: int
+        """
+        bit = SQUARE_MASKS[sq]
+        self.pieces[PAWN] &= ~bit
+        self.pieces[piece_type] |= bit
+
+    def to_board(self):
+        """
+        Returns the position as a list of 8 lists of piece keys numbered the way Board() and load_fen do,
+        pieces are numbered in row major order, so rooks on their starting squares become 'R1' and 'R2'.
+        :return: 8 x 8 board
+        :rtype: list
+        """
+        board = [[1] * 8 for i in range(8)]
+        counters = [[0] * 6, [0] * 6]
+        for color in (WHITE, BLACK):
+            prefix = 'w' if color == WHITE else 'b'
+            for piece_type, mask in enumerate(self.pieces):
+                for sq in iter_squares(mask & self.colors[color]):
+                    counters[color][piece_type] += 1
+                    num = counters[color][piece_type]
+                    if piece_type in NUMBERED_PIECES:
+                        key = PIECE_CHARS[piece_type] + str(num)
+                    elif piece_type == QUEEN and num > 1:
+                        key = 'Q' + str(num - 1)
+                    else:
+                        key = PIECE_CHARS[piece_type]
+                    board[sq >> 3][sq & 7] = prefix + key
+        return board
+
+    def to_fen(self):
+        """
+        Returns fen string of this position.
+        :rtype: str
+        """
+        fen = ''
+        for i in range(8):
+            empty_squares = 0
+            for j in range(8):
+                piece = self.piece_at(i * 8 + j)
+                if piece is None:
+                    empty_squares += 1
+                    continue
+                if empty_squares:
+                    fen += str(empty_squares)
+                    empty_squares = 0
+                char = PIECE_CHARS[piece[1]]
+                fen += char if piece[0] == WHITE else char.lower()
+            fen += str(empty_squares) if empty_squares else ''
+            fen += '/' if i < 7 else ''
+        castling = ''
+        castling += 'K' if self.white_can_castle['ks'] else ''
+        castling += 'Q' if self.white_can_castle['qs'] else ''
+        castling += 'k' if self.black_can_castle['ks'] else ''
+        castling += 'q' if self.black_can_castle['qs'] else ''
+        return fen + ' ' + self.turn[0] + ' ' + (castling if castling else '-')
@@ -1,32 +1,41 @@
+from chess.attack_tables import BETWEEN, RAYS
+
 
 class DangerLines(list):
-    def __init__(self, inverse_dict, opp_inverse_dict, k_loc):
+    """
+    List subclass, the KingTargetingPseudoLine objects of the opponent's queens, rooks and bishops whose pseudo
+    moves reach one side's king. Checks are found with the BETWEEN table: a line checks the king if no square
+    between its piece and the king is occupied.
+    """
+    def __init__(self, bitboard, k_loc):
+        """
+        :param bitboard: bitboard of the match, its occupancy is read when checking for check
+        :param k_loc: location of the king
+        :type bitboard: Bitboard
+        :type k_loc: tuple
+        """
+        super().__init__()
         self.keys = set()
-        self.inv_pieces = inverse_dict
-        self.opp_inv_pieces = opp_inverse_dict
+        self.bitboard = bitboard
         self.king_loc = k_loc
         self.king_attacker = None
 
     def delete_line(self, key):
         """
-        Deletes self[key], and removes key from self.keys.
+        Deletes the line of key, and removes key from self.keys.
         :param key: piece to delete moves of.
         :type key: str
         """
-        for i, line in enumerate(self):
-            if line.key == key:
-                self.keys.discard(self[i].key)
-                del self[i]
+        self[:] = [line for line in self if line.key != key]
+        self.keys.discard(key)
 
     def delete_lines(self):
         """
         King's location changed so we delete the lines no longer attacking the king.
         """
-        for i, line in enumerate(self):
-            if self.king_loc not in line:
-                self.keys.discard(self[i].key)
-                del self[i]
-                self.delete_lines()
+        king_sq = self.king_loc[0] * 8 + self.king_loc[1]
+        self[:] = [line for line in self if line.mask >> king_sq & 1]
+        self.keys = {line.key for line in self}
 
     def king_moved(self, new_loc):
         """
@@ -46,37 +55,30 @@ class DangerLines(list):
         :return: True if targeted else False
         :rtype: bool
         """
+        sq = loc[0] * 8 + loc[1]
         for line in self:
-            if line.is_targeted(loc):
+            if line.mask >> sq & 1:
                 return True
         return False
 
-    def would_be_check(self, loc, move, already_check=False):
+    def pins(self, own):
         """
-        Simulates the scenario of given move played, checks if it would result in check.
-
-        :param loc: location of piece
-        :param move: move to check if it would result in check
-        :param already_check: is it already check?
-        :type loc: tuple
-        :type move: tuple
-        :type already_check: bool
-        :return: True if would be check else false
-        :rtype: bool
+        Returns the pieces of the king's side pinned by the lines in self, a line pins the only piece between its
+        piece and the king if that piece is the king's own.
+        :param own: occupancy mask of the king's side
+        :type own: int
+        :return: for every pinned square the mask of the squares its piece may move to, the squares of the line
+                 between the king and the pinning piece including the pinning piece's square
+        :rtype: dict
         """
-        lines = self.get_targeting_lines(loc)
-        if not already_check:
-            for line in lines:
-                if move == line.loc:
-                    return False
-
-        self.inv_pieces[str(move)] = self.inv_pieces[str(loc)]
-        del self.inv_pieces[str(loc)]
-        result = self.will_be_check(loc, lines=lines)
-        self.king_attacker = None
-        self.inv_pieces[str(loc)] = self.inv_pieces[str(move)]
-        del self.inv_pieces[str(move)]
-        return result
+        between = BETWEEN[self.king_loc[0] * 8 + self.king_loc[1]]
+        occupied = self.bitboard.occupied
+        pins = {}
+        for line in self:
+            blockers = between[line.sq] & occupied
+            if blockers & own and not blockers & (blockers - 1):
+                pins[blockers.bit_length() - 1] = between[line.sq] | 1 << line.sq
+        return pins
 
     def get_attacker(self):
         """
@@ -90,33 +92,32 @@ class DangerLines(list):
 
     def will_be_check(self, move, lines=False):
         """
-        Checks if given move results in check.
-        :param move: move to be checked
+        Checks if the lines through given location give check, called after a piece left it.
+        :param move: location to get the lines through
         :param lines: False if not called by self, otherwise lines targeting given move.
         :type move: tuple
-        :type lines: bool, KingTargetingPseudoLine
+        :type lines: bool, list
         :return: True if move results in check else False
         :rtype: bool
         """
         lines = self.get_targeting_lines(move) if not lines else lines
+        return self.is_check(lines, self.bitboard.occupied)
 
-        if len(lines) == 1:
-            for target in lines[0]:
-                if target == self.king_loc:
-                    self.king_attacker = (lines[0].loc, lines[0].direction)
-                    return True
-                if str(target) in self.inv_pieces.keys() or str(target) in self.opp_inv_pieces.keys():
-                    return False
-
-        for ind, line in enumerate(lines):
-            for target in line:
-                if target == self.king_loc:
-                    self.king_attacker = (line.loc, line.direction)
-                    return True
-                if str(target) in self.inv_pieces.keys() or str(target) in self.opp_inv_pieces.keys():
-                    if ind == len(lines) - 1:
-                        return False
-                    break
+    def is_check(self, lines, occupied):
+        """
+        Checks if one of given lines reaches the king through given occupancy, sets self.king_attacker if so.
+        :param lines: lines targeting the king
+        :param occupied: occupancy mask of both colors
+        :type lines: list
+        :type occupied: int
+        :rtype: bool
+        """
+        between = BETWEEN[self.king_loc[0] * 8 + self.king_loc[1]]
+        for line in lines:
+            if not between[line.sq] & occupied:
+                self.king_attacker = (line.loc, line.direction)
+                return True
+        return False
 
     def get_targeting_lines(self, loc):
         """
@@ -127,11 +128,8 @@ class DangerLines(list):
         :return: list of KingTargetingPseudoLine objects targeting given location
         :rtype: KingTargetingPseudoLine
         """
-        danger_lines = []
-        for line in self:
-            if line.is_targeted(loc):
-                danger_lines.append(line)
-        return danger_lines
+        sq = loc[0] * 8 + loc[1]
+        return [line for line in self if line.mask >> sq & 1]
 
     def is_king_attacker(self, key):
         """
@@ -142,9 +140,7 @@ class DangerLines(list):
         :return: True if key in self.keys else False
         :rtype: bool
         """
-        if key in self.keys:
-            return True
-        return False
+        return key in self.keys
 
     def append_x(self, king_targ_ps_line):
         """
@@ -164,7 +160,7 @@ class KingTargetingPseudoLine(list):
     """
     def __init__(self, key, loc, direction, moves):
         """
-        Calls super().__init__(moves), sets self._set to None.
+        Calls super().__init__(moves), sets the square of the piece and the mask of its moves.
         :param key: the targeting piece
         :param loc: loc of targeting piece
         :param direction: direction aimed at by targeting piece
@@ -174,40 +170,45 @@ class KingTargetingPseudoLine(list):
         self.key = key
         self.loc = loc
         self.direction = direction
-        self._set = None
+        self.sq = loc[0] * 8 + loc[1]
+        self.mask = RAYS[direction][self.sq]
 
     def is_targeted(self, loc):
         """
-        Checks if loc is in self. initializes self._set if not already initialized.
+        Checks if loc is in self.
         :param loc: location that might be targeted
         :type loc: tuple
         :return: True if targeted else False
         :rtype: bool
         """
-        if not self._set:
-            self._set = set(self)
-        if loc in self._set:
-            return True
-        return False
+        return bool(self.mask >> (loc[0] * 8 + loc[1]) & 1)
 
 
 class SquaresTargeted(dict):
+    """
+    Dict subclass, the moves of the pawns, knights and king of one side by key. self.move_set counts for every
+    square the pieces targeting it, a square is in it as long as it is targeted.
+    """
     def __init__(self):
-        self.move_set = set()
+        super().__init__()
+        self.move_set = {}
 
     def assign(self, key, moves):
         """
-        Assigns given moves to self[key] and updates self.move_set
+        Assigns given moves to self[key] and updates the counts of the squares which changed in self.move_set
         :param key: piece whose moves to assign
         :param moves: moves to assign to self[key] as a set given as a list of tuples
         :type key: str
         :type moves: list
         :return:
         """
-        self[key] = set(moves)
-        self.move_set = set()
-        for key in self:
-            self.move_set.update(self[key])
+        moves = set(moves)
+        old_moves = self.get(key, set())
+        self.release(old_moves - moves)
+        move_set = self.move_set
+        for move in moves - old_moves:
+            move_set[move] = move_set.get(move, 0) + 1
+        self[key] = moves
 
     def piece_died(self, key):
         """
@@ -215,7 +216,18 @@ class SquaresTargeted(dict):
         :param key: piece that died
         :type key: str
         """
-        del self[key]
-        self.move_set = set()
-        for key in self:
-            self.move_set.update(self[key])
+        self.release(self.pop(key))
+
+    def release(self, moves):
+        """
+        Lowers the counts of given squares in self.move_set, squares no longer targeted are removed.
+        :param moves: squares no longer targeted by a piece
+        :type moves: set
+        """
+        move_set = self.move_set
+        for move in moves:
+            count = move_set[move] - 1
+            if count:
+                move_set[move] = count
+            else:
+                del move_set[move]
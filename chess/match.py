@@ -1,19 +1,44 @@
 from chess.board import Board
+from chess.bitboard import Bitboard, SQUARE_MASKS, QUEEN, WHITE, BLACK, iter_squares
+from chess.attack_tables import RAY_MOVES, QUEEN_DIRECTIONS, BISHOP_DIRECTIONS, ROOK_DIRECTIONS, ray_moves
 from copy import deepcopy
 from chess.moves import *
 from random import choice
 from chess.king_attacking_line import KingTargetingPseudoLine, DangerLines, SquaresTargeted
+from chess import playout, batch_playout
 import logging
 import json
 from multiprocessing import Process
 
-all_ps_moves = ps_moves_per_loc()
+ALL_SQUARES = (1 << 64) - 1
+
+
+def piece_directions(key):
+    """
+    Returns the directions a queen, bishop or rook moves in, in the order used by the move dicts.
+    :param key: piece, must be a queen, bishop or rook
+    :type key: str
+    :rtype: tuple
+    """
+    if 'Q' in key:
+        return QUEEN_DIRECTIONS
+    elif 'B' in key:
+        return BISHOP_DIRECTIONS
+    return ROOK_DIRECTIONS
 
 
 class Match:
     def __init__(self, state=Board().board, turn='white', wcks=True, wcqs=True, bcks=True, bcqs=True):
-        self.white_can_castle = {'ks': wcks, 'qs': wcqs}
-        self.black_can_castle = {'ks': bcks, 'qs': bcqs}
+        if isinstance(state, Bitboard):
+            turn = state.turn
+            wcks, wcqs = state.white_can_castle['ks'], state.white_can_castle['qs']
+            bcks, bcqs = state.black_can_castle['ks'], state.black_can_castle['qs']
+            self.bitboard = state.copy()
+            state = state.to_board()
+        else:
+            self.bitboard = Bitboard.from_board(state, turn, wcks, wcqs, bcks, bcqs)
+        self.white_can_castle = self.bitboard.white_can_castle
+        self.black_can_castle = self.bitboard.black_can_castle
         self.state = state
         self.fen = convert_to_fen(self.state, turn, wcks, wcqs, bcks, bcqs)
         self.black_pieces_locations = {}
@@ -24,16 +49,15 @@ class Match:
         self.ps_white_moves = {}
         self.black_moves = {}
         self.white_moves = {}
+        self.black_unchecked_moves = {}
+        self.white_unchecked_moves = {}
+        self.attackers = [set() for sq in range(64)]
+        self.attacked_squares = {}
         self.set_piece_locations()
         self.continuous_non_capped_turns = 0
         try:
-            self.black_king_targeting_ps_lines = DangerLines(self.board_locations_occupied_by_black,
-                                                             self.board_locations_occupied_by_white,
-                                                             self.black_pieces_locations['K'])
-
-            self.white_king_targeting_ps_lines = DangerLines(self.board_locations_occupied_by_white,
-                                                             self.board_locations_occupied_by_black,
-                                                             self.white_pieces_locations['K'])
+            self.black_king_targeting_ps_lines = DangerLines(self.bitboard, self.black_pieces_locations['K'])
+            self.white_king_targeting_ps_lines = DangerLines(self.bitboard, self.white_pieces_locations['K'])
         except KeyError:
             for row in self.state:
                 print(row)
@@ -52,6 +76,8 @@ class Match:
                                    'keys': [], 'moves': [], 'state': self.state, 'fen': self.fen}
         self.key = None
         self.trace = []
+        self.undo_stack = []
+        self.move_buffer = []
         self.set_all_ps_moves()
 
     def is_in_black_ps_moves(self, move):
@@ -62,11 +88,9 @@ class Match:
         :return: True if move is in black pseudo moves else False
         :rtype: bool
         """
-        for key in self.ps_black_moves:
-            if 'Q' in key or 'B' in key or 'R' in key:
-                for direction in self.ps_black_moves[key]:
-                    if move in self.ps_black_moves[key][direction]:
-                        return True
+        for color, key in self.attackers[move[0] * 8 + move[1]]:
+            if color == 'black' and ('Q' in key or 'B' in key or 'R' in key):
+                return True
         return False
 
     def is_in_white_ps_moves(self, move):
@@ -77,11 +101,9 @@ class Match:
         :return: True if move is in white pseudo moves else False
         :rtype: bool
         """
-        for key in self.ps_white_moves:
-            if 'Q' in key or 'B' in key or 'R' in key:
-                for direction in self.ps_white_moves[key]:
-                    if move in self.ps_white_moves[key][direction]:
-                        return True
+        for color, key in self.attackers[move[0] * 8 + move[1]]:
+            if color == 'white' and ('Q' in key or 'B' in key or 'R' in key):
+                return True
         return False
 
     def legal_line(self, moves, color, per_mov=False, board=False):
@@ -98,8 +120,23 @@ class Match:
         :return: legal moves
         :rtype: list
         """
-        board = self.state if not board else board
         new_moves = []
+        if not board:
+            own = self.bitboard.colors[WHITE if color == 'white' else BLACK]
+            if per_mov:
+                for move in moves:
+                    if not own & SQUARE_MASKS[move[0] * 8 + move[1]]:
+                        new_moves.append(move)
+                return new_moves
+            occupied = own | self.bitboard.colors[BLACK if color == 'white' else WHITE]
+            for move in moves:
+                bit = SQUARE_MASKS[move[0] * 8 + move[1]]
+                if own & bit:
+                    return new_moves
+                new_moves.append(move)
+                if occupied & bit:
+                    return new_moves
+            return new_moves
         if color == 'white':
             me, opp = 'w', 'b'
         else:
@@ -120,6 +157,22 @@ class Match:
                     new_moves.append(move)
         return new_moves
 
+    def legal_ray(self, loc, direction, color):
+        """
+        Returns legal moves of a queen, bishop or rook on given location in given direction.
+        :param loc: location of the piece
+        :param direction: direction of the moves
+        :param color: side of the piece, must be 'black' or 'white'
+        :type loc: tuple
+        :type direction: str
+        :type color: str
+        :return: legal moves
+        :rtype: list
+        """
+        colors = self.bitboard.colors
+        own = colors[WHITE if color == 'white' else BLACK]
+        return ray_moves(loc[0] * 8 + loc[1], direction, own, colors[WHITE] | colors[BLACK])
+
     def set_piece_locations(self):
         """
         Called one time at initialisation, sets locations for pieces of both sides.
@@ -128,13 +181,11 @@ class Match:
         for num in range(2):
             pieces = {}
             locations_occupied = {}
-            me = 'w' if num == 0 else 'b'
-            for i, row in enumerate(self.state):
-                for j, sq in enumerate(row):
-                    if me in str(sq):
-                        key = sq.replace(me, '')
-                        pieces[key] = (i, j)
-                        locations_occupied['({}, {})'.format(i, j)] = key
+            for sq in iter_squares(self.bitboard.colors[num]):
+                i, j = sq >> 3, sq & 7
+                key = self.state[i][j][1:]
+                pieces[key] = (i, j)
+                locations_occupied['({}, {})'.format(i, j)] = key
             if num == 0:
                 self.white_pieces_locations = pieces
                 self.board_locations_occupied_by_white = locations_occupied
@@ -142,6 +193,25 @@ class Match:
                 self.black_pieces_locations = pieces
                 self.board_locations_occupied_by_black = locations_occupied
 
+    def set_attacks(self, key, color, squares=()):
+        """
+        Replaces the squares given piece attacks in the attack map self.attackers, which holds (color, key) of every
+        piece whose pseudo moves reach a square. Kings are not in the map, their moves are updated every move.
+        :param key: piece, cannot be a king
+        :param color: side of the piece, must be 'black' or 'white'
+        :param squares: squares of the piece's pseudo moves, empty if the piece left the board
+        :type key: str
+        :type color: str
+        :type squares: list
+        """
+        piece = (color, key)
+        for sq in self.attacked_squares.pop(piece, ()):
+            self.attackers[sq].discard(piece)
+        if squares:
+            self.attacked_squares[piece] = squares
+            for sq in squares:
+                self.attackers[sq].add(piece)
+
     def get_king_targeting_lines(self, color, loc=False, get_direction=False):
         """
         Returns the pieces and their lines that target the given location, also returns their direction at index 1*
@@ -157,12 +227,14 @@ class Match:
         """
         if color == 'white':
             ps_move_dict = self.ps_black_moves
+            opp_color = 'black'
             if not loc:
                 king = self.white_pieces_locations['K']
             else:
                 king = loc
         else:
             ps_move_dict = self.ps_white_moves
+            opp_color = 'white'
             if not loc:
                 king = self.black_pieces_locations['K']
             else:
@@ -171,9 +243,11 @@ class Match:
         keys = []
         directions = []
         lines = []
+        attackers = {key for attacker_color, key in self.attackers[king[0] * 8 + king[1]]
+                     if attacker_color == opp_color}
 
         for key in ps_move_dict:
-            if 'Q' in key or 'B' in key or 'R' in key:
+            if key in attackers and ('Q' in key or 'B' in key or 'R' in key):
                 for direction in ps_move_dict[key]:
                     if king in ps_move_dict[key][direction]:
                         if get_direction:
@@ -189,7 +263,9 @@ class Match:
 
     def moves_safety_check(self, color):
         """
-        Checks if legal moves will cause check in which case the move is removed from legal moves.
+        Sets the legal moves of given side from its unchecked moves. Only the moves of the pieces which could give
+        check by moving are filtered: the king, the pinned pieces and, when in check, all pieces, the other pieces
+        share their move lists with the unchecked moves.
         :param color: side to have moves checked, either 'black' or 'white'
         :type color: str
         """
@@ -201,242 +277,83 @@ class Match:
             attackers, lines = self.get_king_targeting_lines(color, loc=move)
             row = piece_locations[key][0]
             col = piece_locations[key][1]
-            safe = True
-            for attacker, line in zip(attackers, lines):
-
-                sim_board = deepcopy(self.state)
-                sim_board[row][col] = 1
-                sim_board[move[0]][move[1]] = me + key
-
-                if move[1] == col - 3:
-                    sim_board[row][0] = 1
-                    sim_board[row][2] = me + 'R1'
-                elif move[1] == col + 2:
-                    sim_board[row][7] = 1
-                    sim_board[row][5] = me + 'R2'
-
-                if move in self.legal_line(line, opp_color, board=sim_board):
-                    safe = False
-                    break
-            if safe:
-                safe_moves.append(move)
+            sim_occupied = occupied & ~SQUARE_MASKS[row * 8 + col] | SQUARE_MASKS[move[0] * 8 + move[1]]
+            if move[1] == col - 3:
+                sim_occupied = sim_occupied & ~SQUARE_MASKS[row * 8] | SQUARE_MASKS[row * 8 + 2]
+            elif move[1] == col + 2:
+                sim_occupied = sim_occupied & ~SQUARE_MASKS[row * 8 + 7] | SQUARE_MASKS[row * 8 + 5]
+
+            for line in lines:
+                for target in line:
+                    if target == move:
+                        return
+                    if sim_occupied & SQUARE_MASKS[target[0] * 8 + target[1]]:
+                        break
+            safe_moves.append(move)
 
         if color == 'white':
-            move_dict = self.white_moves
+            move_dict = self.white_moves = dict(self.white_unchecked_moves)
             k_targeting_ps_lines = self.white_king_targeting_ps_lines
             opp_non_iter_moves = self.black_non_iterative
             is_in_opp_moves = self.is_in_black_ps_moves
-            opp, me = 'b', 'w'
-            opp_color = 'black'
             check = self.w_check
-            piece_locations = self.white_pieces_locations
-            pawn_one_step_two_steps, start_row = (-1, -2), 6
+            piece_locations, inv_pieces = self.white_pieces_locations, self.board_locations_occupied_by_white
         else:
-            move_dict = self.black_moves
+            move_dict = self.black_moves = dict(self.black_unchecked_moves)
             k_targeting_ps_lines = self.black_king_targeting_ps_lines
             opp_non_iter_moves = self.white_non_iterative
             is_in_opp_moves = self.is_in_white_ps_moves
-            opp, me = 'w', 'b'
-            opp_color = 'white'
             check = self.b_check
-            piece_locations = self.black_pieces_locations
-            pawn_one_step_two_steps, start_row = (1, 2), 1
-
-        for key in move_dict:
-            if 'Q' in key or 'R' in key or 'B' in key:
-                if check:
-                    if len(self.king_attackers_locations) > 1:
-                        move_dict[key] = None
-                        continue
-                    if k_targeting_ps_lines.is_targeted(piece_locations[key]):
-                        for direction in move_dict[key]:
-                            safe_moves = []
-                            for move in move_dict[key][direction]:
-                                if k_targeting_ps_lines.would_be_check(piece_locations[key], move, already_check=check):
-                                    break
-                                elif move in self.king_attacking_line or move in self.king_attackers_locations:
-                                    safe_moves.append(move)
-                            move_dict[key][direction] = safe_moves
-                    else:
-                        for direction in move_dict[key]:
-                            safe_moves = []
-                            for move in move_dict[key][direction]:
-                                if move in self.king_attacking_line or move in self.king_attackers_locations:
-                                    safe_moves.append(move)
-
-                            move_dict[key][direction] = safe_moves
-                elif k_targeting_ps_lines:
-                    if k_targeting_ps_lines.is_targeted(piece_locations[key]):
-                        for direction in move_dict[key]:
-                            safe_moves = []
-                            for move in move_dict[key][direction]:
-                                if k_targeting_ps_lines.would_be_check(piece_locations[key], move):
-                                    break
-                                safe_moves.append(move)
-                            move_dict[key][direction] = safe_moves
-                bad_directions = []
-                for direction in move_dict[key]:
-                    if not move_dict[key][direction]:
-                        bad_directions.append(direction)
-                for direction in bad_directions:
-                    del move_dict[key][direction]
-            elif 'N' in key:
-                if not move_dict[key]:
-                    continue
-                if check:
-                    if len(self.king_attackers_locations) > 1:
-                        move_dict[key] = None
-                        continue
-                    if k_targeting_ps_lines.is_targeted(piece_locations[key]):
-                        if k_targeting_ps_lines.would_be_check(piece_locations[key],
-                                                               move_dict[key][0],
-                                                               already_check=check):
-
-                            move_dict[key] = None
-                            continue
-
-                        safe_moves = []
-                        for move in move_dict[key]:
-                            if move in self.king_attacking_line or move in self.king_attackers_locations:
-                                safe_moves.append(move)
-                        move_dict[key] = safe_moves if safe_moves else None
-                        continue
-                    else:
-                        safe_moves = []
-                        for move in move_dict[key]:
-                            if move in self.king_attacking_line or move in self.king_attackers_locations:
-                                safe_moves.append(move)
-                        move_dict[key] = safe_moves if safe_moves else None
-                        continue
-                elif k_targeting_ps_lines:
-                    if k_targeting_ps_lines.is_targeted(piece_locations[key]):
-                        if k_targeting_ps_lines.would_be_check(piece_locations[key], move_dict[key][0]):
-                            move_dict[key] = None
-                            continue
-            elif 'P' in key:
-                if piece_locations[key][0] + pawn_one_step_two_steps[0] not in range(8):
-                    move_dict[key] = None
-                    continue
-                one_step = (piece_locations[key][0] + pawn_one_step_two_steps[0], piece_locations[key][1])
-                safe_moves = []
-                if check:
-                    if len(self.king_attackers_locations) > 1:
-                        move_dict[key] = None
-                        continue
-                    danger = False
-                    if k_targeting_ps_lines.is_targeted(piece_locations[key]):
-                        danger = True
-                        for move in move_dict[key]:
-                            if k_targeting_ps_lines.would_be_check(piece_locations[key], move, already_check=check):
-                                continue
-                            if move in self.king_attackers_locations:
-                                safe_moves.append(move)
-                    else:
-                        for move in move_dict[key]:
-                            if move in self.king_attackers_locations:
-                                safe_moves.append(move)
-                    if danger:
-                        if str(self.state[one_step[0]][one_step[1]]) == '1':
-                            if k_targeting_ps_lines.would_be_check(piece_locations[key], one_step):
-                                move_dict[key] = safe_moves if safe_moves else None
-                                continue
-                            if one_step in self.king_attacking_line:
-                                safe_moves.append(one_step)
-                            if piece_locations[key][0] == start_row:
-                                two_steps = (piece_locations[key][0] + pawn_one_step_two_steps[1], piece_locations[key][1])
-                                if str(self.state[two_steps[0]][two_steps[1]]) == '1':
-                                    if two_steps in self.king_attacking_line:
-                                        safe_moves.append(two_steps)
-                    else:
-                        if str(self.state[one_step[0]][one_step[1]]) == '1':
-                            if one_step in self.king_attacking_line:
-                                safe_moves.append(one_step)
-                            if piece_locations[key][0] == start_row:
-                                two_steps = (piece_locations[key][0] + pawn_one_step_two_steps[1],
-                                             piece_locations[key][1])
-
-                                if str(self.state[two_steps[0]][two_steps[1]]) == '1':
-                                    if two_steps in self.king_attacking_line:
-                                        safe_moves.append(two_steps)
-                elif k_targeting_ps_lines:
-                    danger = False
-                    if k_targeting_ps_lines.is_targeted(piece_locations[key]):
-                        danger = True
-                        for move in move_dict[key]:
-                            if k_targeting_ps_lines.would_be_check(piece_locations[key], move):
-                                continue
-                            else:
-                                if opp in str(self.state[move[0]][move[1]]):
-                                    safe_moves.append(move)
-                    else:
-                        for move in move_dict[key]:
-                            if opp in str(self.state[move[0]][move[1]]):
-                                safe_moves.append(move)
-                    if str(self.state[one_step[0]][one_step[1]]) == '1':
-                        if danger:
-                            if k_targeting_ps_lines.would_be_check(piece_locations[key], one_step):
-                                move_dict[key] = safe_moves if safe_moves else None
-                                continue
-                            else:
-                                safe_moves.append(one_step)
-                                if piece_locations[key][0] == start_row:
-                                    two_steps = (piece_locations[key][0] + pawn_one_step_two_steps[1],
-                                                 piece_locations[key][1])
-
-                                    if str(self.state[two_steps[0]][two_steps[1]]) == '1':
-                                        safe_moves.append(two_steps)
-                        else:
-                            safe_moves.append(one_step)
-                            if piece_locations[key][0] == start_row:
-                                two_steps = (piece_locations[key][0] + pawn_one_step_two_steps[1],
-                                             piece_locations[key][1])
-
-                                if str(self.state[two_steps[0]][two_steps[1]]) == '1':
-                                    safe_moves.append(two_steps)
-                else:
-                    for move in move_dict[key]:
-                        if opp in str(self.state[move[0]][move[1]]):
-                            safe_moves.append(move)
-
-                    if str(self.state[one_step[0]][one_step[1]]) == '1':
-                        safe_moves.append(one_step)
-                        if piece_locations[key][0] == start_row:
-                            two_steps = (piece_locations[key][0] + pawn_one_step_two_steps[1], piece_locations[key][1])
-                            if str(self.state[two_steps[0]][two_steps[1]]) == '1':
-                                safe_moves.append(two_steps)
-
-                move_dict[key] = safe_moves if safe_moves else None
+            piece_locations, inv_pieces = self.black_pieces_locations, self.board_locations_occupied_by_black
+        occupied = self.bitboard.occupied
 
+        if check and len(self.king_attackers_locations) > 1:
+            for key in list(move_dict):
+                if key != 'K':
+                    del move_dict[key]
+        else:
+            allowed = ALL_SQUARES
+            if check:
+                allowed = 0
+                for row, col in self.king_attacking_line + self.king_attackers_locations:
+                    allowed |= SQUARE_MASKS[row * 8 + col]
+            pins = k_targeting_ps_lines.pins(self.bitboard.color_mask(color)) if k_targeting_ps_lines else {}
+            if check:
+                keys = [key for key in move_dict if key != 'K']
             else:
-                safe_moves = []
-                if check:
-                    for move in move_dict[key]:
-                        if move in self.king_attacking_line or move in opp_non_iter_moves.move_set:
-                            continue
-                        elif is_in_opp_moves(move):
-                            kings_move_is_dangerous()
-                        else:
-                            safe_moves.append(move)
-                    move_dict[key] = safe_moves if safe_moves else None
+                keys = [inv_pieces[str((sq >> 3, sq & 7))] for sq in pins]
+            for key in keys:
+                row, col = piece_locations[key]
+                mask = allowed & pins[row * 8 + col] if row * 8 + col in pins else allowed
+                if type(move_dict[key]) is dict:
+                    safe_moves = {}
+                    for direction, moves in move_dict[key].items():
+                        moves = [move for move in moves if mask & SQUARE_MASKS[move[0] * 8 + move[1]]]
+                        if moves:
+                            safe_moves[direction] = moves
                 else:
-                    for move in move_dict[key]:
-                        if move in opp_non_iter_moves.move_set:
-                            continue
-                        elif is_in_opp_moves(move):
-                            kings_move_is_dangerous()
-                        else:
-                            safe_moves.append(move)
+                    safe_moves = [move for move in move_dict[key] if mask & SQUARE_MASKS[move[0] * 8 + move[1]]]
+                if safe_moves:
                     move_dict[key] = safe_moves
+                else:
+                    del move_dict[key]
 
-        keys_to_del = []
-        for key in move_dict:
-            if not move_dict[key]:
-                keys_to_del.append(key)
-
-        for key in keys_to_del:
-            del move_dict[key]
+        if 'K' in move_dict:
+            key = 'K'
+            safe_moves = []
+            for move in move_dict[key]:
+                if move in opp_non_iter_moves.move_set or (check and move in self.king_attacking_line):
+                    continue
+                elif is_in_opp_moves(move):
+                    kings_move_is_dangerous()
+                else:
+                    safe_moves.append(move)
+            if safe_moves:
+                move_dict[key] = safe_moves
+            else:
+                del move_dict[key]
 
-        if not move_dict:
+        if not any(move_dict.values()):
             self.check_mate = True
             self.winner = 'black' if color == 'white' else 'white'
 
@@ -469,20 +386,51 @@ class Match:
             self.moves_safety_check(color='white')
             self.moves_safety_check(color='black')
 
-    def random_move(self):
+    def legal_moves(self, color=None, buffer=None):
         """
-        Selects a random move and the. makes the move.
+        Returns the legal moves of given side as one flat list of moves packed by chess.moves.encode_move, in the
+        order of the move dicts with the directions of queens, rooks and bishops one after another.
+        :param color: side whose moves are returned, default is the side to move
+        :param buffer: list to fill with the moves instead of a new list, it is cleared first
+        :type color: str
+        :type buffer: list
+        :rtype: list
         """
-        moves = self.white_moves if self.turn == 'white' else self.black_moves
-        random_key = choice(list(moves.keys()))
-
-        if random_key != 'K' and 'P' not in random_key and 'N' not in random_key:
-            random_direction = choice(list(moves[random_key].keys()))
-            random_move = choice(moves[random_key][random_direction])
+        color = self.turn if color is None else color
+        if color == 'white':
+            move_dict, pieces_locations, pawn_edge_row = self.white_moves, self.white_pieces_locations, 0
+        else:
+            move_dict, pieces_locations, pawn_edge_row = self.black_moves, self.black_pieces_locations, 7
+        if buffer is None:
+            moves = []
         else:
-            random_move = choice(moves[random_key])
+            moves = buffer
+            moves.clear()
+        for key, piece_moves in move_dict.items():
+            loc = pieces_locations[key]
+            from_sq = loc[0] * 8 + loc[1]
+            if type(piece_moves) is dict:
+                for direction in piece_moves:
+                    for move in piece_moves[direction]:
+                        moves.append(from_sq | (move[0] * 8 + move[1]) << TO_SHIFT)
+            elif 'P' in key:
+                for move in piece_moves:
+                    promotion = (QUEEN + 1) << PROMOTION_SHIFT if move[0] == pawn_edge_row else 0
+                    moves.append(from_sq | (move[0] * 8 + move[1]) << TO_SHIFT | promotion)
+            elif key == 'K':
+                for move in piece_moves:
+                    castle = CASTLE if move[1] == loc[1] - 3 or move[1] == loc[1] + 2 else 0
+                    moves.append(from_sq | (move[0] * 8 + move[1]) << TO_SHIFT | castle)
+            else:
+                for move in piece_moves:
+                    moves.append(from_sq | (move[0] * 8 + move[1]) << TO_SHIFT)
+        return moves
 
-        self.make_move(random_move, random_key)
+    def random_move(self):
+        """
+        Selects a random legal move, each uniformly, and makes the move.
+        """
+        self.make_encoded_move(choice(self.legal_moves(buffer=self.move_buffer)))
 
     def simulate(self):
         """
@@ -512,7 +460,7 @@ class Match:
                 raise
 
             opp_k_targeting_ps_lines = self.black_king_targeting_ps_lines
-            move_dict = self.white_moves
+            move_dict = self.white_unchecked_moves
             ps_move_dict = self.ps_white_moves
         else:
             try:
@@ -522,28 +470,12 @@ class Match:
                 raise
 
             opp_k_targeting_ps_lines = self.white_king_targeting_ps_lines
-            move_dict = self.black_moves
+            move_dict = self.black_unchecked_moves
             ps_move_dict = self.ps_black_moves
 
-        ps_moves = []
-        for direction in ps_move_dict[key]:
-            ps_moves.append(ps_move_dict[key][direction])
-
-        if 'Q' in key:
-            directions = ('tr', 'tl', 'br', 'bl', 'u', 'd', 'r', 'l')
-        elif 'R' in key:
-            directions = ('u', 'd', 'r', 'l')
-        else:
-            directions = ('tr', 'tl', 'br', 'bl')
-
-        if len(ps_moves) == 4:
-            leg_moves = (self.legal_line(ps_moves[0], color), self.legal_line(ps_moves[1], color),
-                         self.legal_line(ps_moves[2], color), self.legal_line(ps_moves[3], color))
-        else:
-            leg_moves = (self.legal_line(ps_moves[0], color), self.legal_line(ps_moves[1], color),
-                         self.legal_line(ps_moves[2], color), self.legal_line(ps_moves[3], color),
-                         self.legal_line(ps_moves[4], color), self.legal_line(ps_moves[5], color),
-                         self.legal_line(ps_moves[6], color), self.legal_line(ps_moves[7], color))
+        directions = piece_directions(key)
+        ps_moves = [ps_move_dict[key][direction] for direction in directions]
+        leg_moves = [self.legal_ray(loc, direction, color) for direction in directions]
 
         move_dict[key] = {}
         for index, direction in enumerate(directions):
@@ -562,38 +494,19 @@ class Match:
 
     def update_legal_iterative_moves(self, key, color):
         """
-        This sets the reachable squares a.k.a legal moves. ps_moves must already be set!
+        This sets the reachable squares a.k.a legal moves, before moves_safety_check. ps_moves must already be set!
         :param key: piece to have legal moves updated, cannot be a pawn, knight or king
         :param color: side of the piece, must be 'black' or 'white'
         :type key: str
         :type color: str
         """
-        ps_move_dict = self.ps_white_moves if color == 'white' else self.ps_black_moves
-        leg_move_dict = self.white_moves if color == 'white' else self.black_moves
+        loc = self.white_pieces_locations[key] if color == 'white' else self.black_pieces_locations[key]
+        leg_move_dict = self.white_unchecked_moves if color == 'white' else self.black_unchecked_moves
         leg_move_dict[key] = {}
-
-        if 'Q' in key:
-            tr, tl = ps_move_dict[key]['tr'], ps_move_dict[key]['tl']
-            br, bl = ps_move_dict[key]['br'], ps_move_dict[key]['bl']
-            u, d = ps_move_dict[key]['u'], ps_move_dict[key]['d']
-            r, l = ps_move_dict[key]['r'], ps_move_dict[key]['l']
-
-            leg_move_dict[key]['tr'], leg_move_dict[key]['tl'] = self.legal_line(tr, color), self.legal_line(tl, color)
-            leg_move_dict[key]['br'], leg_move_dict[key]['bl'] = self.legal_line(br, color), self.legal_line(bl, color)
-            leg_move_dict[key]['u'], leg_move_dict[key]['d'] = self.legal_line(u, color), self.legal_line(d, color)
-            leg_move_dict[key]['r'], leg_move_dict[key]['l'] = self.legal_line(r, color), self.legal_line(l, color)
-        elif 'B' in key:
-            tr, tl = ps_move_dict[key]['tr'], ps_move_dict[key]['tl']
-            br, bl = ps_move_dict[key]['br'], ps_move_dict[key]['bl']
-
-            leg_move_dict[key]['tr'], leg_move_dict[key]['tl'] = self.legal_line(tr, color), self.legal_line(tl, color)
-            leg_move_dict[key]['br'], leg_move_dict[key]['bl'] = self.legal_line(br, color), self.legal_line(bl, color)
-        else:
-            u, d = ps_move_dict[key]['u'], ps_move_dict[key]['d']
-            r, l = ps_move_dict[key]['r'], ps_move_dict[key]['l']
-
-            leg_move_dict[key]['u'], leg_move_dict[key]['d'] = self.legal_line(u, color), self.legal_line(d, color)
-            leg_move_dict[key]['r'], leg_move_dict[key]['l'] = self.legal_line(r, color), self.legal_line(l, color)
+        for direction in piece_directions(key):
+            moves = self.legal_ray(loc, direction, color)
+            if moves:
+                leg_move_dict[key][direction] = moves
 
     def update_ps_iterative_moves(self, key, color):
         """
@@ -605,30 +518,16 @@ class Match:
         """
         loc = self.white_pieces_locations[key] if color == 'white' else self.black_pieces_locations[key]
         ps_move_dict = self.ps_white_moves if color == 'white' else self.ps_black_moves
-        ps_move_dict[key] = {}
-        pmk = str(loc)
-        if 'Q' in key:
-
-            ps_move_dict[key]['tr'], ps_move_dict[key]['tl'] = all_ps_moves[pmk]['tr'], all_ps_moves[pmk]['tl']
-            ps_move_dict[key]['br'], ps_move_dict[key]['bl'] = all_ps_moves[pmk]['br'], all_ps_moves[pmk]['bl']
-            ps_move_dict[key]['u'], ps_move_dict[key]['d'] = all_ps_moves[pmk]['u'], all_ps_moves[pmk]['d']
-            ps_move_dict[key]['r'], ps_move_dict[key]['l'] = all_ps_moves[pmk]['r'], all_ps_moves[pmk]['l']
-
-        elif 'B' in key:
-
-            ps_move_dict[key]['tr'], ps_move_dict[key]['tl'] = all_ps_moves[pmk]['tr'], all_ps_moves[pmk]['tl']
-            ps_move_dict[key]['br'], ps_move_dict[key]['bl'] = all_ps_moves[pmk]['br'], all_ps_moves[pmk]['bl']
-
-        else:
-
-            ps_move_dict[key]['u'], ps_move_dict[key]['d'] = all_ps_moves[pmk]['u'], all_ps_moves[pmk]['d']
-            ps_move_dict[key]['r'], ps_move_dict[key]['l'] = all_ps_moves[pmk]['r'], all_ps_moves[pmk]['l']
+        rays = RAY_MOVES[loc[0] * 8 + loc[1]]
+        ps_move_dict[key] = {direction: rays[direction] for direction in piece_directions(key)}
+        self.set_attacks(key, color, [row * 8 + col for direction in ps_move_dict[key]
+                                      for row, col in ps_move_dict[key][direction]])
 
         self.check_or_king_ps_targeted(key, loc, color)
 
     def update_legal_non_iterative_moves(self, key, color):
         """
-        This sets the legal moves. ps_moves must already be set!
+        This sets the legal moves, before moves_safety_check. ps_moves must already be set!
         :param key: piece to have legal moves updated, must be a pawn, knight or king
         :param color: side of the piece, must be 'black' or 'white'
         :type key: str
@@ -638,8 +537,34 @@ class Match:
             self.update_king_moves(color)
             return
         moves = self.ps_white_moves[key] if color == 'white' else self.ps_black_moves[key]
-        leg_move_dict = self.white_moves if color == 'white' else self.black_moves
-        leg_move_dict[key] = self.legal_line(moves, color, per_mov=True)
+        leg_move_dict = self.white_unchecked_moves if color == 'white' else self.black_unchecked_moves
+        if 'P' in key:
+            leg_move_dict[key] = self.legal_pawn_moves(key, color)
+        else:
+            leg_move_dict[key] = self.legal_line(moves, color, per_mov=True)
+
+    def legal_pawn_moves(self, key, color):
+        """
+        Returns the captures of given pawn onto the opponent's pieces followed by its pushes onto empty squares.
+        :param key: pawn to get the moves of
+        :param color: side of the pawn, must be 'black' or 'white'
+        :type key: str
+        :type color: str
+        :rtype: list
+        """
+        colors = self.bitboard.colors
+        if color == 'white':
+            loc, opp, step, start_row = self.white_pieces_locations[key], colors[BLACK], -1, 6
+        else:
+            loc, opp, step, start_row = self.black_pieces_locations[key], colors[WHITE], 1, 1
+        moves = [move for move in ps_pawn_cap_moves(loc, color) if opp & SQUARE_MASKS[move[0] * 8 + move[1]]]
+        occupied = colors[WHITE] | colors[BLACK]
+        row, col = loc[0] + step, loc[1]
+        if not occupied & SQUARE_MASKS[row * 8 + col]:
+            moves.append((row, col))
+            if loc[0] == start_row and not occupied & SQUARE_MASKS[(row + step) * 8 + col]:
+                moves.append((row + step, col))
+        return moves
 
     def update_ps_non_iterative_moves(self, key, color):
         """
@@ -657,7 +582,6 @@ class Match:
                 self.save_game(fn='king_loc_non_it.json')
                 raise
             ps_moves = self.ps_white_moves
-            move_dict = self.white_moves
             non_it_moves = self.white_non_iterative
         else:
             loc = self.black_pieces_locations[key]
@@ -667,19 +591,23 @@ class Match:
                 self.save_game(fn='king_loc_non_it.json')
                 raise
             ps_moves = self.ps_black_moves
-            move_dict = self.black_moves
             non_it_moves = self.black_non_iterative
 
         if 'P' in key:
             moves = ps_pawn_cap_moves(loc, color)
+            step = -8 if color == 'white' else 8
+            pushes = [loc[0] * 8 + loc[1] + step]
+            if loc[0] == (6 if color == 'white' else 1):
+                pushes.append(pushes[0] + step)
         else:
             moves = ps_knight_moves(loc)
+            pushes = []
 
         non_it_moves.assign(key, moves)
         ps_moves[key] = moves
+        self.set_attacks(key, color, [row * 8 + col for row, col in moves] + pushes)
 
-        leg_moves = self.legal_line(moves, color, per_mov=True)
-        move_dict[key] = leg_moves
+        self.update_legal_non_iterative_moves(key, color)
 
         if king_loc in moves:
             if color == 'white':
@@ -723,23 +651,24 @@ class Match:
             loc = self.white_pieces_locations['K']
             can_castle = self.white_can_castle
             ps_moves = self.ps_white_moves
-            move_dict, pieces = self.white_moves, self.white_pieces_locations
+            move_dict, pieces = self.white_unchecked_moves, self.white_pieces_locations
             non_it_moves = self.white_non_iterative
         else:
             loc = self.black_pieces_locations['K']
             can_castle = self.black_can_castle
             ps_moves = self.ps_black_moves
-            move_dict, pieces = self.black_moves, self.black_pieces_locations
+            move_dict, pieces = self.black_unchecked_moves, self.black_pieces_locations
             non_it_moves = self.black_non_iterative
 
         moves = ps_king_moves(loc, color)
         ps_moves['K'] = moves
         non_it_moves.assign('K', moves)
         leg_moves = self.legal_line(moves, color, per_mov=True)
+        occupied = self.bitboard.occupied
         if can_castle['ks']:
             ps_moves['K'].append((pieces['K'][0], 6))
             for col in range(5, 7):
-                if self.state[pieces['K'][0]][col] != 1:
+                if occupied & SQUARE_MASKS[pieces['K'][0] * 8 + col]:
                     break
                 if col == 6:
                     leg_moves.append((pieces['K'][0], 6))
@@ -747,7 +676,7 @@ class Match:
         if can_castle['qs']:
             ps_moves['K'].append((pieces['K'][0], 1))
             for col in range(3, 0, -1):
-                if self.state[pieces['K'][0]][col] != 1:
+                if occupied & SQUARE_MASKS[pieces['K'][0] * 8 + col]:
                     break
                 if col == 1:
                     leg_moves.append((pieces['K'][0], 1))
@@ -771,13 +700,13 @@ class Match:
         if self.turn == 'white':
             opp_k_targeting_ps_lines, opp_non_iter_moves = self.black_king_targeting_ps_lines, self.black_non_iterative
             pieces_locations, inv_pieces = self.white_pieces_locations, self.board_locations_occupied_by_white
-            ps_moves, moves = self.ps_white_moves, self.white_moves
+            ps_moves, moves = self.ps_white_moves, self.white_unchecked_moves
             pawn_edge_row = 0
             can_castle = self.white_can_castle
         else:
             opp_k_targeting_ps_lines, opp_non_iter_moves = self.white_king_targeting_ps_lines, self.white_non_iterative
             pieces_locations, inv_pieces = self.black_pieces_locations, self.board_locations_occupied_by_black
-            ps_moves, moves = self.ps_black_moves, self.black_moves
+            ps_moves, moves = self.ps_black_moves, self.black_unchecked_moves
             pawn_edge_row = 7
             can_castle = self.black_can_castle
 
@@ -817,11 +746,13 @@ class Match:
         elif 'P' in key and move[0] == pawn_edge_row:
             non_it_moves = self.white_non_iterative if self.turn == 'white' else self.black_non_iterative
             non_it_moves.piece_died(key)
+            self.set_attacks(key, self.turn)
             del pieces_locations[key], ps_moves[key], moves[key]
             self.key = 'Q' + key[1]
             key = self.key
             ps_moves[key] = {}
             self.state[move[0]][move[1]] = self.turn[0] + key
+            self.bitboard.promote(move[0] * 8 + move[1], QUEEN)
 
         pieces_locations[key] = move
         inv_pieces[str(move)] = key
@@ -863,12 +794,14 @@ class Match:
         """
         if self.turn == 'white':
             danger_lines = self.white_king_targeting_ps_lines
-            opp_ps_moves, opp_moves, opp_non_it_moves = self.ps_black_moves, self.black_moves, self.black_non_iterative
+            opp_ps_moves, opp_non_it_moves = self.ps_black_moves, self.black_non_iterative
+            opp_moves, opp_color = self.black_unchecked_moves, 'black'
             opp_pieces, opp_inv_pieces = self.black_pieces_locations, self.board_locations_occupied_by_black
             opp_can_castle = self.black_can_castle
         else:
             danger_lines = self.black_king_targeting_ps_lines
-            opp_ps_moves, opp_moves, opp_non_it_moves = self.ps_white_moves, self.white_moves, self.white_non_iterative
+            opp_ps_moves, opp_non_it_moves = self.ps_white_moves, self.white_non_iterative
+            opp_moves, opp_color = self.white_unchecked_moves, 'white'
             opp_pieces, opp_inv_pieces = self.white_pieces_locations, self.board_locations_occupied_by_white
             opp_can_castle = self.white_can_castle
 
@@ -884,6 +817,7 @@ class Match:
                     danger_lines.delete_line(capped)
             else:
                 opp_non_it_moves.piece_died(capped)
+            self.set_attacks(capped, opp_color)
             try:
                 del opp_pieces[capped], opp_ps_moves[capped], opp_inv_pieces[str(move)], opp_moves[capped]
             except KeyError:
@@ -906,12 +840,118 @@ class Match:
         with open(fn, 'w') as f:
             json.dump(self.moves_keys_history, f, indent=1)
 
+    def push(self, move, key):
+        """
+        Saves the current position on self.undo_stack, then makes given move. Call self.pop() to take it back.
+        :param move: move to be made
+        :param key: piece to move
+        :type move: tuple
+        :type key: str
+        """
+        danger_lines = (self.white_king_targeting_ps_lines, self.black_king_targeting_ps_lines)
+        non_iterative = (self.white_non_iterative, self.black_non_iterative)
+        self.undo_stack.append((
+            [row[:] for row in self.state],
+            self.bitboard.pieces[:], self.bitboard.colors[:],
+            dict(self.white_can_castle), dict(self.black_can_castle),
+            dict(self.white_pieces_locations), dict(self.black_pieces_locations),
+            dict(self.board_locations_occupied_by_white), dict(self.board_locations_occupied_by_black),
+            dict(self.ps_white_moves), dict(self.ps_black_moves), dict(self.white_moves), dict(self.black_moves),
+            dict(self.white_unchecked_moves), dict(self.black_unchecked_moves),
+            [set(attackers) for attackers in self.attackers], dict(self.attacked_squares),
+            [(list(lines), set(lines.keys), lines.king_loc) for lines in danger_lines],
+            [(dict(squares), dict(squares.move_set)) for squares in non_iterative],
+            self.continuous_non_capped_turns, self.turn, self.key, self.b_check, self.w_check,
+            self.king_attackers_locations[:], self.king_attacking_line[:],
+            self.check_mate, self.winner, self.draw,
+        ))
+        self.make_move(move, key)
+
+    def pop(self):
+        """
+        Takes back the last move made by self.push(move, key).
+        """
+        (state, pieces, colors, white_can_castle, black_can_castle,
+         white_pieces, black_pieces, white_occupied, black_occupied,
+         ps_white_moves, ps_black_moves, white_moves, black_moves,
+         self.white_unchecked_moves, self.black_unchecked_moves, self.attackers, self.attacked_squares,
+         danger_lines, non_iterative,
+         self.continuous_non_capped_turns, self.turn, self.key, self.b_check, self.w_check,
+         self.king_attackers_locations, self.king_attacking_line,
+         self.check_mate, self.winner, self.draw) = self.undo_stack.pop()
+
+        for row, saved_row in zip(self.state, state):
+            row[:] = saved_row
+        self.bitboard.pieces, self.bitboard.colors, self.bitboard.turn = pieces, colors, self.turn
+        for current, saved in ((self.white_can_castle, white_can_castle), (self.black_can_castle, black_can_castle),
+                               (self.white_pieces_locations, white_pieces),
+                               (self.black_pieces_locations, black_pieces),
+                               (self.board_locations_occupied_by_white, white_occupied),
+                               (self.board_locations_occupied_by_black, black_occupied)):
+            current.clear()
+            current.update(saved)
+        self.ps_white_moves, self.ps_black_moves = ps_white_moves, ps_black_moves
+        self.white_moves, self.black_moves = white_moves, black_moves
+        for lines, (saved_lines, keys, king_loc) in zip((self.white_king_targeting_ps_lines,
+                                                         self.black_king_targeting_ps_lines), danger_lines):
+            lines[:] = saved_lines
+            lines.keys, lines.king_loc, lines.king_attacker = keys, king_loc, None
+        for squares, (saved_squares, move_set) in zip((self.white_non_iterative, self.black_non_iterative),
+                                                      non_iterative):
+            squares.clear()
+            squares.update(saved_squares)
+            squares.move_set = move_set
+        del self.moves_keys_history['keys'][-1], self.moves_keys_history['moves'][-1]
+
+    def encode_move(self, move, key):
+        """
+        Returns given move of given piece of the side to move as a packed int, see chess.moves.encode_move.
+        :param move: location to move to
+        :param key: piece to move
+        :type move: tuple
+        :type key: str
+        :rtype: int
+        """
+        loc = self.white_pieces_locations[key] if self.turn == 'white' else self.black_pieces_locations[key]
+        promotion, flags = 0, 0
+        if 'P' in key and (move[0] == 0 or move[0] == 7):
+            promotion = QUEEN + 1
+        elif key == 'K' and (move[1] == loc[1] - 3 or move[1] == loc[1] + 2):
+            flags = CASTLE
+        return encode_move(loc, move, promotion, flags)
+
+    def decode_move(self, move):
+        """
+        Returns the location moved to and the key of the piece moved of a packed move of the side to move.
+        :param move: packed move, see chess.moves.encode_move
+        :type move: int
+        :return: location to move to, piece to move
+        :rtype: tuple
+        """
+        inv_pieces = (self.board_locations_occupied_by_white if self.turn == 'white' else
+                      self.board_locations_occupied_by_black)
+        return move_to(move), inv_pieces[str(move_from(move))]
+
+    def make_encoded_move(self, move):
+        """
+        Makes a packed move of the side to move, see self.make_move. Pawns are always promoted to a queen, so a
+        move promoting to another piece type is refused.
+        :param move: packed move, see chess.moves.encode_move
+        :type move: int
+        :raises ValueError: when move promotes to another piece type than a queen
+        """
+        promotion = move_promotion(move)
+        if promotion and promotion != QUEEN + 1:
+            raise ValueError('Cannot promote to piece type {}, pawns are promoted to a queen.'.format(promotion - 1))
+        self.make_move(*self.decode_move(move))
+
     def make_move(self, move, key):
         """
         Places piece in new location and updates data:
         self.is_piece_capped(...),
         self.update_logs(...)
-        and updates moves for pieces needing it.
+        and updates moves for pieces needing it: the moved piece, the kings and the pieces self.attackers lists on
+        the squares whose occupation changed, the legal moves of all other pieces stay the same.
         :param move: move to be made
         :param key: piece to move
         """
@@ -939,6 +979,8 @@ class Match:
         piece = self.state[old_loc[0]][old_loc[1]]
         self.state[old_loc[0]][old_loc[1]] = 1
         self.state[move[0]][move[1]] = piece
+        self.bitboard.move(old_loc[0] * 8 + old_loc[1], move[0] * 8 + move[1])
+        changed = [old_loc[0] * 8 + old_loc[1], move[0] * 8 + move[1]]
 
         castled = False
         if self.key == 'K':
@@ -946,13 +988,20 @@ class Match:
                 castled = True
                 rook1, self.state[move[0]][0] = self.state[move[0]][0], 1
                 self.state[move[0]][2] = rook1
+                self.bitboard.move(move[0] * 8, move[0] * 8 + 2)
+                changed += [move[0] * 8, move[0] * 8 + 2]
 
             elif move[1] == pieces_locations[self.key][1] + 2:
                 castled = True
                 rook2, self.state[move[0]][7] = self.state[move[0]][7], 1
                 self.state[move[0]][5] = rook2
+                self.bitboard.move(move[0] * 8 + 7, move[0] * 8 + 5)
+                changed += [move[0] * 8 + 7, move[0] * 8 + 5]
 
         self.update_logs(self.key, move, old_loc, castled)
+        affected = set()
+        for sq in changed:
+            affected.update(self.attackers[sq])
 
         def update_moves(_key, _color):
             if 'P' not in _key and 'N' not in _key and 'K' not in _key:
@@ -972,11 +1021,16 @@ class Match:
         for key_2 in ps_moves:
             if key_2 == self.key:
                 update_moves(key_2, self.turn)
-                continue
-            update_legal_moves(key_2, self.turn)
+            elif key_2 == 'K' or (self.turn, key_2) in affected:
+                update_legal_moves(key_2, self.turn)
         for key_2 in opp_ps_moves:
-            update_legal_moves(key_2, opp)
+            if key_2 == 'K' or (opp, key_2) in affected:
+                update_legal_moves(key_2, opp)
 
+        if self.turn == 'white':
+            self.white_moves = self.white_unchecked_moves
+        else:
+            self.black_moves = self.black_unchecked_moves
         self.moves_safety_check(opp)
 
         if len(self.black_pieces_locations) == 1 and len(self.white_pieces_locations) == 1:
@@ -984,6 +1038,7 @@ class Match:
             self.winner = None
 
         self.turn = 'black' if self.turn == 'white' else 'white'
+        self.bitboard.turn = self.turn
         self.w_check = False
         self.b_check = False
         self.king_attackers_locations = []
@@ -1022,3 +1077,40 @@ def random_game(board, turn, white_can_castle, black_can_castle):
     bcks, bcqs = black_can_castle['ks'], black_can_castle['qs']
     match = Match(state=board, turn=turn, wcks=wcks, wcqs=wcqs, bcks=bcks, bcqs=bcqs)
     return match.simulate()
+
+
+def random_games(board, turn, white_can_castle, black_can_castle, n, pool=None, fast=False, batch=0):
+    """
+    Plays n independent random chess games from given board, returns their winners.
+    :param board: board to start the games from, is not modified
+    :param turn: next side to move, 'black' or 'white'
+    :param white_can_castle: castling availability for white
+    :param black_can_castle: castling availability for black
+    :param n: amount of games
+    :param pool: the games are played by this pool's worker processes if given, else one by one
+    :param fast: plays the games with the playout engine of chess.playout instead of Match if True
+    :param batch: plays the games in lockstep with chess.batch_playout if n is at least batch and NumPy is
+                  available, in batches of at most batch_playout.MAX_BATCH games, 0 never does
+    :type board: tuple[list]
+    :type turn: str
+    :type white_can_castle: dict
+    :type black_can_castle: dict
+    :type n: int
+    :type pool: multiprocessing.pool.Pool
+    :type fast: bool
+    :type batch: int
+    :return: winner of every game
+    :rtype: list
+    """
+    if batch and n >= batch and batch_playout.available:
+        batches = -(-n // batch_playout.MAX_BATCH)
+        games = [(board, turn, white_can_castle, black_can_castle, n // batches + (i < n % batches))
+                 for i in range(batches)]
+        if pool is None:
+            return [winner for args in games for winner in batch_playout.random_games(*args)]
+        return [winner for winners in pool.starmap(batch_playout.random_games, games) for winner in winners]
+    game = playout.random_game if fast else random_game
+    games = [([row[:] for row in board], turn, white_can_castle, black_can_castle) for i in range(n)]
+    if pool is None:
+        return [game(*args) for args in games]
+    return pool.starmap(game, games)
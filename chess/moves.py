@@ -1,154 +1,52 @@
+from chess.attack_tables import KING_MOVES, KNIGHT_MOVES, PAWN_CAPTURE_MOVES
 
-
-def top_moves(loc):
-    """
-    Returns pseudo legal moves, vertical in top direction
-    :param loc: location of piece to get moves for
-    :type loc: tuple
-    :return: pseudo legal moves in top direction
-    :rtype: list
-    """
-    u_moves = []
-    if loc[0] < 7:
-        for rank in range(loc[0] + 1, 8):
-            u_moves.append((rank, loc[1]))
-    return u_moves
+TO_SHIFT, PROMOTION_SHIFT = 6, 12
+CASTLE = 1 << 15
 
 
-def bottom_moves(loc):
+def encode_move(from_loc, to_loc, promotion=0, flags=0):
     """
-    Returns pseudo legal moves, vertical in bottom direction
-    :param loc: location of piece to get moves for
-    :type loc: tuple
-    :return: pseudo legal moves in left direction
-    :rtype: list
+    Packs a move in an int: square moved from in bits 0-5, square moved to in bits 6-11, promotion in bits 12-14
+    and flags like CASTLE from bit 15 on, squares are row * 8 + column.
+    :param from_loc: location moved from
+    :param to_loc: location moved to
+    :param promotion: piece type of chess.bitboard promoted to plus one, 0 if the move is no promotion
+    :param flags: CASTLE or 0
+    :type from_loc: tuple
+    :type to_loc: tuple
+    :type promotion: int
+    :type flags: int
+    :rtype: int
     """
-    d_moves = []
-    if loc[0] > 0:
-        for rank in range(loc[0] - 1, -1, -1):
-            d_moves.append((rank, loc[1]))
-    return d_moves
+    return (from_loc[0] * 8 + from_loc[1] | (to_loc[0] * 8 + to_loc[1]) << TO_SHIFT |
+            promotion << PROMOTION_SHIFT | flags)
 
 
-def right_moves(loc):
-    """
-    Returns pseudo legal moves, horizontal in right direction
-    :param loc: location of piece to get moves for
-    :type loc: tuple
-    :return: pseudo legal moves in right direction
-    :rtype: list
+def move_from(move):
     """
-    r_moves = []
-    if loc[1] < 7:
-        for file in range(loc[1] + 1, 8):
-            r_moves.append((loc[0], file))
-    return r_moves
-
-
-def left_moves(loc):
-    """
-    Returns pseudo legal moves, horizontal in left direction
-    :param loc: location of piece to get moves for
-    :type loc: tuple
-    :return: pseudo legal moves in left direction
-    :rtype: list
-    """
-    l_moves = []
-    if loc[1] > 0:
-        for file in range(loc[1] - 1, -1, -1):
-            l_moves.append((loc[0], file))
-    return l_moves
-
-
-def top_left_moves(loc):
-    """
-    Returns pseudo legal moves, diagonal in top left direction
-    :param loc: location of piece to get moves for
-    :type loc: tuple
-    :return: pseudo legal moves in top left direction
-    :rtype: list
-    """
-    tl_moves = []
-    if loc[0] > 0 and loc[1] > 0:
-        for dist in range(1, min((loc[0], loc[1])) + 1):
-            tl_moves.append((loc[0] - dist, loc[1] - dist))
-    return tl_moves
-
-
-def bottom_right_moves(loc):
-    """
-    Returns pseudo legal moves, diagonal in bottom right direction
-    :param loc: location of piece to get moves for
-    :type loc: tuple
-    :return: pseudo legal moves in bottom right direction
-    :rtype: list
-    """
-    br_moves = []
-    if loc[0] < 7 and loc[1] < 7:
-        for dist in range(1, 8 - max((loc[0], loc[1]))):
-            br_moves.append((loc[0] + dist, loc[1] + dist))
-    return br_moves
-
-
-def bottom_left_moves(loc):
-    """
-    Returns pseudo legal moves, diagonal in bottom left direction
-    :param loc: location of piece to get moves for
-    :type loc: tuple
-    :return: pseudo legal moves in bottom left direction
-    :rtype: list
-    """
-    bl_moves = []
-    if loc[0] < 7 and loc[1] > 0:
-        for dist in range(1, min((8 - loc[0], loc[1] + 1))):
-            bl_moves.append((loc[0] + dist, loc[1] - dist))
-    return bl_moves
-
-
-def top_right_moves(loc):
-    """
-    Returns pseudo legal moves, diagonal in top right direction
-    :param loc: location of piece to get moves for
-    :type loc: tuple
-    :return: pseudo legal moves in top right direction
-    :rtype: list
+    Returns the location a packed move is made from, see encode_move.
+    :type move: int
+    :rtype: tuple
     """
-    tr_moves = []
-    if loc[0] > 0 and loc[1] < 7:
-        for dist in range(1, min((loc[0] + 1, 8 - loc[1]))):
-            tr_moves.append((loc[0] - dist, loc[1] + dist))
-    return tr_moves
+    return (move >> 3) & 7, move & 7
 
 
-def set_2nd_layer_keys_moves(_dict):
+def move_to(move):
     """
-    Called by ps_moves_per_loc, sets the moves with corresponding direction in dictionary
-    :param _dict: base dictionary from ps_moves_per_loc
-    :type _dict: dict
+    Returns the location a packed move is made to, see encode_move.
+    :type move: int
+    :rtype: tuple
     """
-    directions = ('u', 'd', 'r', 'l', 'tl', 'br', 'tr', 'bl')
-    move_functions = (top_moves, bottom_moves, right_moves, left_moves,
-                      top_left_moves, bottom_right_moves, top_right_moves, bottom_left_moves)
-    for key in _dict:
-        loc = (int(key[1]), int(key[4]))
-        for index, direction in enumerate(directions):
-            _dict[key][direction] = move_functions[index](loc)
+    return (move >> 9) & 7, (move >> TO_SHIFT) & 7
 
 
-def ps_moves_per_loc():
+def move_promotion(move):
     """
-    Creates dictionary with all board locations as keys for a dictionary with keys for each direction
-    and all pseudo legal moves available for each location and direction. Only moves for queen's bishops and rooks
-
-    :return: returns the dictionary
-    :rtype: dict
+    Returns the piece type of chess.bitboard a packed move promotes to plus one, 0 if it is no promotion.
+    :type move: int
+    :rtype: int
     """
-    _dict = {}
-    for i in range(8):
-        for j in range(8):
-            _dict[str((i, j))] = {}
-    set_2nd_layer_keys_moves(_dict)
-    return _dict
+    return (move >> PROMOTION_SHIFT) & 7
 
 
 def ps_king_moves(loc, color):
@@ -158,20 +56,10 @@ def ps_king_moves(loc, color):
     :param color: king's color
     :type loc: tuple
     :type color: str
-    :return: pseudo legal moves
+    :return: pseudo legal moves, a new list which can be extended with castling moves
     :rtype: list
     """
-    king_moves = ((1, 1), (-1, 1), (1, -1), (-1, -1), (0, 1), (0, -1), (1, 0), (-1, 0))
-    moves = []
-    if color == 'white':
-        for move in king_moves:
-            if loc[0] + move[0] in range(8) and loc[1] + move[1] in range(8):
-                moves.append((loc[0] + move[0], loc[1] + move[1]))
-    else:
-        for move in king_moves:
-            if loc[0] + move[0] in range(8) and loc[1] + move[1] in range(8):
-                moves.append((loc[0] + move[0], loc[1] + move[1]))
-    return moves
+    return list(KING_MOVES[loc[0] * 8 + loc[1]])
 
 
 def ps_knight_moves(loc):
@@ -179,15 +67,10 @@ def ps_knight_moves(loc):
     Returns pseudo legal knight move.
     :param loc: knight's location
     :type loc: tuple
-    :return: pseudo legal moves
-    :rtype: list
+    :return: pseudo legal moves, shared with attack_tables.KNIGHT_MOVES
+    :rtype: tuple
     """
-    knight_moves = ((-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2))
-    moves = []
-    for move in knight_moves:
-        if loc[0] + move[0] in range(8) and loc[1] + move[1] in range(8):
-            moves.append((loc[0] + move[0], loc[1] + move[1]))
-    return moves
+    return KNIGHT_MOVES[loc[0] * 8 + loc[1]]
 
 
 def ps_pawn_cap_moves(loc, color):
@@ -197,20 +80,10 @@ def ps_pawn_cap_moves(loc, color):
     :param color: pawn's color, either 'black' or 'white'
     :type loc: tuple
     :type color: str
-    :return: pawn's pseudo legal capture moves
+    :return: pawn's pseudo legal capture moves, shared with attack_tables.PAWN_CAPTURE_MOVES
+    :rtype: tuple
     """
-    moves = []
-    if color == 'white':
-        if loc[0] - 1 > -1 and loc[1] - 1 > -1:
-            moves.append((loc[0] - 1, loc[1] - 1))
-        if loc[0] - 1 > -1 and loc[1] + 1 < 8:
-            moves.append((loc[0] - 1, loc[1] + 1))
-    else:
-        if loc[0] + 1 < 8 and loc[1] - 1 > -1:
-            moves.append((loc[0] + 1, loc[1] - 1))
-        if loc[0] + 1 < 8 and loc[1] + 1 < 8:
-            moves.append((loc[0] + 1, loc[1] + 1))
-    return moves
+    return PAWN_CAPTURE_MOVES[color][loc[0] * 8 + loc[1]]
 
 
 def convert_to_fen(board, turn, wcks, wcqs, bcks, bcqs):
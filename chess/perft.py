@@ -0,0 +1,145 @@
+"""
+Perft, counts the leaves of the legal move tree of a position to a given depth. Checks the move generator of Match
+against known counts and measures its speed in nodes per second, run before and after changing the move generator:
+
+    python -m chess.perft 4
+    python -m chess.perft 3 --fen "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -" --divide
+    python -m chess.perft --verify
+
+Counts follow the rules of Match, which has no en passant, promotes to queens only and lets the king castle through
+attacked squares, so the known counts differ from standard chess wherever those moves occur.
+"""
+import argparse
+import time
+from chess.match import Match
+from chess.bitboard import Bitboard
+from chess.moves import move_from, move_to
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -'
+
+# fen and the counts at depth 1, 2, ... under the rules of Match
+KNOWN_COUNTS = (
+    (START_FEN, (20, 400, 8902, 197281)),
+    ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -', (14, 191, 2810)),
+    ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -', (48, 2041)),
+)
+
+
+def match_from_fen(fen):
+    """
+    Returns a Match in the position of given fen, castling availability is taken from its third field.
+    :param fen: fen string of the position
+    :type fen: str
+    :rtype: Match
+    """
+    return Match(Bitboard.from_fen(fen))
+
+
+def perft(match, depth):
+    """
+    Returns the amount of leaves of the legal move tree of given match at given depth. The match is returned to
+    its position with Match.push and Match.pop, the moves of the last ply are counted without being made.
+    :param match: match to count the moves of, the side to move moves first
+    :param depth: amount of plies
+    :type match: Match
+    :type depth: int
+    :rtype: int
+    """
+    if depth == 0:
+        return 1
+    moves = match.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        match.push(*match.decode_move(move))
+        nodes += perft(match, depth - 1)
+        match.pop()
+    return nodes
+
+
+def divide(match, depth):
+    """
+    Returns the amount of leaves at given depth below every move of the side to move, to find the move whose
+    subtree differs from a reference count.
+    :param match: match to count the moves of
+    :param depth: amount of plies including the divided move, at least 1
+    :type match: Match
+    :type depth: int
+    :return: (from location, to location, leaves) for every legal move
+    :rtype: list
+    """
+    result = []
+    for move in match.legal_moves():
+        match.push(*match.decode_move(move))
+        result.append((move_from(move), move_to(move), perft(match, depth - 1)))
+        match.pop()
+    return result
+
+
+def timed_perft(fen, depth):
+    """
+    Returns the leaves at given depth of the position of given fen and the seconds it took to count them.
+    :param fen: fen string of the position
+    :param depth: amount of plies
+    :type fen: str
+    :type depth: int
+    :return: leaves, seconds
+    :rtype: tuple
+    """
+    match = match_from_fen(fen)
+    before = time.perf_counter()
+    nodes = perft(match, depth)
+    return nodes, time.perf_counter() - before
+
+
+def verify(max_depth=None):
+    """
+    Compares perft of every position of KNOWN_COUNTS up to given depth with its known counts.
+    :param max_depth: deepest depth to check, None checks every known count
+    :type max_depth: int
+    :return: (fen, depth, expected, counted) for every count that differs
+    :rtype: list
+    """
+    failures = []
+    for fen, counts in KNOWN_COUNTS:
+        match = match_from_fen(fen)
+        for depth, expected in enumerate(counts[:max_depth], 1):
+            counted = perft(match, depth)
+            if counted != expected:
+                failures.append((fen, depth, expected, counted))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Counts the leaves of the legal move tree of a position.')
+    parser.add_argument('depth', type=int, nargs='?', help='amount of plies, default is 3')
+    parser.add_argument('--fen', default=START_FEN, help='position to count, default is the start position')
+    parser.add_argument('--divide', action='store_true', help='prints the leaves below every move')
+    parser.add_argument('--verify', action='store_true',
+                        help='checks the known counts, up to depth if given, instead, exits with 1 if one differs')
+    args = parser.parse_args()
+
+    if args.verify:
+        failures = verify(args.depth)
+        for fen, depth, expected, counted in failures:
+            print('{} depth {}: expected {}, counted {}'.format(fen, depth, expected, counted))
+        print('ok' if not failures else '{} counts differ'.format(len(failures)))
+        raise SystemExit(1 if failures else 0)
+
+    depth = 3 if args.depth is None else args.depth
+    if args.divide:
+        before = time.perf_counter()
+        result = divide(match_from_fen(args.fen), depth)
+        seconds = time.perf_counter() - before
+        for from_loc, to_loc, leaves in result:
+            print(from_loc, to_loc, leaves)
+        print('moves', len(result))
+        nodes = sum(leaves for from_loc, to_loc, leaves in result)
+    else:
+        nodes, seconds = timed_perft(args.fen, depth)
+    print('nodes {} seconds {:.3f} nodes/s {:.0f}'.format(nodes, seconds, nodes / seconds if seconds else 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+"""
+Lightweight playout engine. Plays random games under the rules of Match on a 64 square mailbox, without pseudo
+move dicts, DangerLines, SquaresTargeted or a move history, for roll outs that only need the winner.
+
+Rules and random policy are those of Match: pawns promote to queens only, there is no en passant, castling only
+requires the squares between king and rook to be empty and the king's destination not to be attacked, a side
+without legal moves loses, 50 moves in a row without a capture or a position with bare kings is a draw.
+Moves are chosen uniformly among all legal moves.
+"""
+from random import choice
+from chess.attack_tables import DIRECTIONS, KING_MOVES, KNIGHT_MOVES, PAWN_CAPTURE_MOVES, RAY_MOVES
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+PIECE_TYPES = {'P': PAWN, 'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+WHITE, BLACK = 1, -1
+
+KING_SQUARES = tuple(tuple(r * 8 + c for r, c in moves) for moves in KING_MOVES)
+KNIGHT_SQUARES = tuple(tuple(r * 8 + c for r, c in moves) for moves in KNIGHT_MOVES)
+PAWN_CAPTURE_SQUARES = {WHITE: tuple(tuple(r * 8 + c for r, c in moves) for moves in PAWN_CAPTURE_MOVES['white']),
+                        BLACK: tuple(tuple(r * 8 + c for r, c in moves) for moves in PAWN_CAPTURE_MOVES['black'])}
+RAY_SQUARES = tuple(tuple(tuple(r * 8 + c for r, c in rays[direction]) for direction in DIRECTIONS)
+                    for rays in RAY_MOVES)
+ORTHOGONAL, DIAGONAL = (0, 1, 2, 3), (4, 5, 6, 7)
+PIECE_DIRECTIONS = {BISHOP: DIAGONAL, ROOK: ORTHOGONAL, QUEEN: ORTHOGONAL + DIAGONAL}
+PAWN_STEPS = {WHITE: -8, BLACK: 8}
+PAWN_START_ROWS = {WHITE: 6, BLACK: 1}
+PROMOTION_ROWS = {WHITE: 0, BLACK: 7}
+HOME_ROWS = {WHITE: 7, BLACK: 0}
+COLORS = {WHITE: 'white', BLACK: 'black'}
+
+
+class Playout:
+    """
+    Position of a random game, pieces are stored as side * piece type in a list of 64 squares.
+    """
+    def __init__(self, board, turn, white_can_castle, black_can_castle):
+        """
+        :param board: 8 x 8 board of piece keys like 'wP3', empty squares are 1, is not modified
+        :param turn: next side to move, 'black' or 'white'
+        :param white_can_castle: castling availability for white
+        :param black_can_castle: castling availability for black
+        :type board: tuple, list
+        :type turn: str
+        :type white_can_castle: dict
+        :type black_can_castle: dict
+        """
+        self.squares = [0] * 64
+        self.pieces = {WHITE: set(), BLACK: set()}
+        self.kings = {}
+        for i, row in enumerate(board):
+            for j, key in enumerate(row):
+                if key == 1:
+                    continue
+                side = WHITE if key[0] == 'w' else BLACK
+                piece_type = PIECE_TYPES[key[1]]
+                sq = i * 8 + j
+                self.squares[sq] = side * piece_type
+                self.pieces[side].add(sq)
+                if piece_type == KING:
+                    self.kings[side] = sq
+        self.side = WHITE if turn == 'white' else BLACK
+        self.can_castle = {WHITE: dict(white_can_castle), BLACK: dict(black_can_castle)}
+        self.continuous_non_capped_turns = 0
+
+    def attacked(self, sq, side):
+        """
+        Returns True if sq is attacked by the opponent of given side.
+        :type sq: int
+        :type side: int
+        :rtype: bool
+        """
+        squares = self.squares
+        opp = -side
+        for target in KNIGHT_SQUARES[sq]:
+            if squares[target] == opp * KNIGHT:
+                return True
+        for target in PAWN_CAPTURE_SQUARES[side][sq]:
+            if squares[target] == opp * PAWN:
+                return True
+        for target in KING_SQUARES[sq]:
+            if squares[target] == opp * KING:
+                return True
+        rays = RAY_SQUARES[sq]
+        for direction in ORTHOGONAL:
+            for target in rays[direction]:
+                piece = squares[target]
+                if piece:
+                    if piece == opp * ROOK or piece == opp * QUEEN:
+                        return True
+                    break
+        for direction in DIAGONAL:
+            for target in rays[direction]:
+                piece = squares[target]
+                if piece:
+                    if piece == opp * BISHOP or piece == opp * QUEEN:
+                        return True
+                    break
+        return False
+
+    def checks_and_pins(self, side):
+        """
+        Returns the amount of pieces giving check to given side's king, the squares a move must reach to resolve a
+        single check and the squares each pinned piece of given side may move to.
+        :type side: int
+        :return: checkers, blocking squares or None, pins
+        :rtype: tuple
+        """
+        squares = self.squares
+        king = self.kings[side]
+        opp = -side
+        checkers, block, pins = 0, None, {}
+        rays = RAY_SQUARES[king]
+        for direction in range(8):
+            slider = opp * ROOK if direction < 4 else opp * BISHOP
+            own = None
+            line = []
+            for target in rays[direction]:
+                line.append(target)
+                piece = squares[target]
+                if not piece:
+                    continue
+                if piece * side > 0:
+                    if own is None:
+                        own = target
+                        continue
+                    break
+                if piece == slider or piece == opp * QUEEN:
+                    if own is None:
+                        checkers += 1
+                        block = set(line)
+                    else:
+                        pins[own] = set(line)
+                break
+        for target in KNIGHT_SQUARES[king]:
+            if squares[target] == opp * KNIGHT:
+                checkers += 1
+                block = {target}
+        for target in PAWN_CAPTURE_SQUARES[side][king]:
+            if squares[target] == opp * PAWN:
+                checkers += 1
+                block = {target}
+        return checkers, block, pins
+
+    def piece_moves(self, sq, checkers, block, pins):
+        """
+        Returns the legal moves of the piece on sq, grouped by direction for queens, rooks and bishops.
+        :param sq: square of a piece of the side to move
+        :param checkers: see checks_and_pins
+        :param block: see checks_and_pins
+        :param pins: see checks_and_pins
+        :type sq: int
+        :type checkers: int
+        :type block: set, None
+        :type pins: dict
+        :return: non empty lists of target squares
+        :rtype: list
+        """
+        squares = self.squares
+        side = self.side
+        piece_type = squares[sq] * side
+        if piece_type == KING:
+            return self.king_moves(sq, checkers)
+        if checkers > 1:
+            return []
+        allowed = pins.get(sq)
+        if block is not None:
+            allowed = block if allowed is None else allowed & block
+        groups = []
+        if piece_type == PAWN:
+            moves = []
+            for target in PAWN_CAPTURE_SQUARES[side][sq]:
+                if squares[target] * side < 0:
+                    moves.append(target)
+            step = PAWN_STEPS[side]
+            target = sq + step
+            if not squares[target]:
+                moves.append(target)
+                if sq >> 3 == PAWN_START_ROWS[side] and not squares[target + step]:
+                    moves.append(target + step)
+            groups.append(moves)
+        elif piece_type == KNIGHT:
+            groups.append([target for target in KNIGHT_SQUARES[sq] if squares[target] * side <= 0])
+        else:
+            rays = RAY_SQUARES[sq]
+            for direction in PIECE_DIRECTIONS[piece_type]:
+                moves = []
+                for target in rays[direction]:
+                    piece = squares[target]
+                    if piece * side > 0:
+                        break
+                    moves.append(target)
+                    if piece:
+                        break
+                groups.append(moves)
+        if allowed is not None:
+            groups = [[target for target in moves if target in allowed] for moves in groups]
+        return [moves for moves in groups if moves]
+
+    def king_moves(self, sq, checkers):
+        """
+        Returns the legal moves of the king on sq, including castling.
+        :param sq: square of the king of the side to move
+        :param checkers: amount of pieces giving check
+        :type sq: int
+        :type checkers: int
+        :return: empty list or a list holding one list of target squares
+        :rtype: list
+        """
+        squares = self.squares
+        side = self.side
+        king = squares[sq]
+        squares[sq] = 0
+        moves = [target for target in KING_SQUARES[sq]
+                 if squares[target] * side <= 0 and not self.attacked(target, side)]
+        can_castle = self.can_castle[side]
+        row = sq & ~7
+        if can_castle['ks'] and not squares[row + 5] and not squares[row + 6]:
+            rook, squares[row + 7], squares[row + 5] = squares[row + 7], 0, side * ROOK
+            if not self.attacked(row + 6, side):
+                moves.append(row + 6)
+            squares[row + 7], squares[row + 5] = rook, 0
+        if can_castle['qs'] and not squares[row + 3] and not squares[row + 2] and not squares[row + 1]:
+            rook, squares[row], squares[row + 2] = squares[row], 0, side * ROOK
+            if not self.attacked(row + 1, side):
+                moves.append(row + 1)
+            squares[row], squares[row + 2] = rook, 0
+        squares[sq] = king
+        return [moves] if moves else []
+
+    def random_move(self):
+        """
+        Returns a legal move of the side to move picked uniformly as (square, target square), None if there is none.
+        :rtype: tuple, None
+        """
+        checkers, block, pins = self.checks_and_pins(self.side)
+        moves = [(sq, target) for sq in self.pieces[self.side]
+                 for group in self.piece_moves(sq, checkers, block, pins) for target in group]
+        return choice(moves) if moves else None
+
+    def has_moves(self):
+        """
+        Returns True if the side to move has a legal move.
+        :rtype: bool
+        """
+        checkers, block, pins = self.checks_and_pins(self.side)
+        for sq in self.pieces[self.side]:
+            if self.piece_moves(sq, checkers, block, pins):
+                return True
+        return False
+
+    def make_move(self, from_sq, to_sq):
+        """
+        Plays given move for the side to move.
+        :type from_sq: int
+        :type to_sq: int
+        :return: False if the move was not made because it is the 50th move in a row without a capture, else True
+        :rtype: bool
+        """
+        squares = self.squares
+        side = self.side
+        opp = -side
+        piece = squares[from_sq]
+        captured = squares[to_sq]
+        if captured:
+            self.continuous_non_capped_turns = 0
+            self.pieces[opp].discard(to_sq)
+            if captured == opp * ROOK and to_sq >> 3 == HOME_ROWS[opp]:
+                if to_sq & 7 == 0:
+                    self.can_castle[opp]['qs'] = False
+                elif to_sq & 7 == 7:
+                    self.can_castle[opp]['ks'] = False
+        else:
+            self.continuous_non_capped_turns += 1
+            if self.continuous_non_capped_turns == 50:
+                return False
+        squares[from_sq] = 0
+        squares[to_sq] = piece
+        pieces = self.pieces[side]
+        pieces.discard(from_sq)
+        pieces.add(to_sq)
+        piece_type = piece * side
+        if piece_type == KING:
+            self.kings[side] = to_sq
+            self.can_castle[side]['ks'], self.can_castle[side]['qs'] = False, False
+            row = from_sq & ~7
+            if to_sq == from_sq + 2:
+                squares[row + 7], squares[row + 5] = 0, side * ROOK
+                pieces.discard(row + 7)
+                pieces.add(row + 5)
+            elif to_sq == from_sq - 3:
+                squares[row], squares[row + 2] = 0, side * ROOK
+                pieces.discard(row)
+                pieces.add(row + 2)
+        elif piece_type == ROOK and from_sq >> 3 == HOME_ROWS[side]:
+            if from_sq & 7 == 0:
+                self.can_castle[side]['qs'] = False
+            elif from_sq & 7 == 7:
+                self.can_castle[side]['ks'] = False
+        elif piece_type == PAWN and to_sq >> 3 == PROMOTION_ROWS[side]:
+            squares[to_sq] = side * QUEEN
+        self.side = opp
+        return True
+
+    def simulate(self):
+        """
+        Plays a random game.
+        :return: returns the winner unless it was a draw in which case it will return None
+        :rtype: str, None
+        """
+        side = self.side
+        self.side = -side
+        blocked = not self.has_moves()
+        self.side = side
+        for n in range(1000000):
+            picked = self.random_move()
+            if picked is None:
+                return COLORS[-self.side]
+            if not self.make_move(*picked):
+                return None
+            if len(self.pieces[WHITE]) == 1 and len(self.pieces[BLACK]) == 1:
+                return None
+            if blocked:
+                # Match flags a side without moves at the start as lost, it takes effect after the first move.
+                return COLORS[side]
+
+
+def random_game(board, turn, white_can_castle, black_can_castle):
+    """
+    Plays random chess game from given board with the playout engine, returns winner.
+    :param board: board to start game from, is not modified
+    :param turn: next side to move, 'black' or 'white'
+    :param white_can_castle: castling availability for white
+    :param black_can_castle: castling availability for black
+    :type board: tuple[list]
+    :type turn: str
+    :type white_can_castle: dict
+    :type black_can_castle: dict
+    :return: winner
+    :rtype: str, None
+    """
+    return Playout(board, turn, white_can_castle, black_can_castle).simulate()
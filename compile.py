@@ -3,16 +3,25 @@ from distutils.extension import Extension
 from Cython.Distutils import build_ext
 ext_modules = [
     Extension("board",  ["chess/board.py"]),
-    Extension("chess_functions",  ["chess/chess_functions.py"]),
+    Extension("bitboard",  ["chess/bitboard.py"]),
+    Extension("attack_tables",  ["chess/attack_tables.py"]),
     Extension("node",  ["origin/node.py"]),
+    Extension("context",  ["origin/context.py"]),
     Extension("match",  ["chess/match.py"]),
+    Extension("playout",  ["chess/playout.py"]),
+    Extension("batch_playout",  ["chess/batch_playout.py"]),
     Extension("moves",  ["chess/moves.py"]),
+    Extension("perft",  ["chess/perft.py"]),
     Extension("queries",  ["database/queries.py"]),
     Extension("database",  ["database/database.py"]),
+    Extension("writer",  ["database/writer.py"]),
     Extension("king_attacking_line",  ["chess/king_attacking_line.py"]),
     Extension("settings",  ["settings.py"]),
+    Extension("instrumentation",  ["instrumentation.py"]),
     Extension("origin", ["origin/origin.py"]),
+    Extension("parallel", ["origin/parallel.py"]),
     Extension("main", ["main.py"]),
+    Extension("benchmark", ["benchmark.py"]),
 ]
 setup(
     name='Origin',
@@ -1,10 +1,14 @@
 import sqlite3
+import time
+import settings
 from database.queries import Queries
 
 
 class Database(Queries):
     """
-    Sqlite3 database, inherits from Queries.
+    Sqlite3 database, inherits from Queries. Walks given to self.buffer_walk are written behind: their value and
+    visits are added up by node and written by self.flush every settings.SAVE_ROUNDS walks or
+    settings.SAVE_SECONDS seconds, call self.flush() before closing.
     """
     def __init__(self, root, fn=r'C:\pythonprojects\chess_prod\database\nodes.db'):
         conn = sqlite3.connect(fn)
@@ -12,101 +16,194 @@ class Database(Queries):
         super(Database, self).__init__(conn)
         self.root = root
         self.tbn = 'white_nodes'
+        self.pending = {}
+        self.pending_rounds = 0
+        self.flushed = time.perf_counter()
 
     def load(self, root):
         """
-        Loads database to given root, sets settings.tot_n.
+        Loads database to given root, sets total visits of root.context. Each table is read in one scan ordered by
+        parent, the children of a node are linked by parent_id in memory, white nodes are children of black nodes
+        and the other way around.
         :param root: root of chess game tree
         :type root: origin.Origin
         """
         from origin.node import Node
 
-        curr = root
-        tbn = 'white_nodes'
-        parent_id = None
-        color = 'white'
-        stack = []
+        children = {}
+        for color in ('white', 'black'):
+            for node_id, move, ind, value, visits, parent_id in self.get_all_nodes('{}_nodes'.format(color)):
+                children.setdefault((color, parent_id), []).append((node_id, move, ind, value, visits))
 
-        while curr:
-            data = self.get_nodes(tbn, parent_id)
-            if data is None:
-                if stack:
-                    new = stack.pop()
-                    curr, parent_id = new['node'], new['node_id']
-                    tbn = '{}_nodes'.format(curr.opp)
-                    color = curr.opp
-                else:
-                    curr = None
-            else:
-                for node in data:
-                    child = Node(eval(node['board']), color, eval(node['move']), node['piece'],
-                                 node['ind'], node['branch_path'],
-                                 eval(node['tcc']), eval(node['ncc']), v=node['val'],
-                                 n=node['visits'])
-
-                    curr.nodes.append(child)
-                    try:
-                        stack.append({'node': curr.nodes[node['ind']], 'node_id': node['node_id']})
-                    except IndexError:
-                        breakpoint()
-
-                new = stack.pop()
-                curr, parent_id = new['node'], new['node_id']
-                tbn = '{}_nodes'.format(curr.opp)
-                color = curr.opp
-        import settings
-        settings.init_tot_n(n=sum(node.visits for node in root.nodes))
+        stack = [(root, 'white', None)]
+        while stack:
+            parent, color, parent_id = stack.pop()
+            rows = children.get((color, parent_id))
+            if rows is None:
+                continue
+            parent.nodes = [Node(parent, color, move, ind, v=value, n=visits, db_id=node_id)
+                            for node_id, move, ind, value, visits in rows]
+            opp = 'black' if color == 'white' else 'white'
+            stack.extend((node, opp, row[0]) for node, row in zip(parent.nodes, rows))
+        root.context.init_tot_n(n=sum(node.visits for node in root.nodes))
 
-    def save_one_walk(self, nodes):
+    def buffer_walk(self, nodes, context):
         """
-        Update values in db of last walked nodes, inserts if not yet present.
+        Adds the points and visits of given walk to self.pending, calls self.flush() once settings.SAVE_ROUNDS walks
+        were buffered or settings.SAVE_SECONDS seconds passed since the last flush.
         :param nodes: nodes walked last training round
+        :param context: context of the training round, holds the points earned
         :type nodes: list, tuple
+        :type context: SearchContext
         """
-        import settings
-        root_node = nodes[0]
-        node_id = self.get_node_id(root_node)
-        if node_id is not None:
-            data = (settings.white_points, settings.VISITS, root_node.branch_path)
-            self.update_value_visits(data, 'white_nodes')
-        else:
-            data = (None,
-                    repr(root_node.state),
-                    repr(root_node.move),
-                    root_node.piece,
-                    root_node.index,
-                    repr(root_node.this_can_castle),
-                    repr(root_node.next_can_castle),
-                    root_node.value,
-                    root_node.visits,
-                    root_node.branch_path,
-                    None)
-            self.insert_node(data, 'white_nodes')
-            node_id = self.get_node_id(root_node)
+        self.buffer_deltas([(node, context.points(node.color), settings.VISITS) for node in nodes])
 
-        nodes = nodes[1:]
+    def buffer_deltas(self, deltas):
+        """
+        Adds the value and visits of one walk to self.pending, see self.buffer_walk.
+        :param deltas: (node, value, visits) for every node walked
+        :type deltas: list
+        """
+        pending = self.pending
+        for node, value, visits in deltas:
+            delta = pending.get(node)
+            if delta is None:
+                pending[node] = [value, visits]
+            else:
+                delta[0] += value
+                delta[1] += visits
+        self.pending_rounds += 1
+        if (self.pending_rounds >= settings.SAVE_ROUNDS or
+                time.perf_counter() - self.flushed >= settings.SAVE_SECONDS):
+            self.flush()
 
-        for node in nodes:
+    def flush(self):
+        """
+        Writes the value and visits buffered in self.pending in one transaction. Rows of nodes already in the db
+        are updated with executemany, other nodes are inserted parents first with the value and visits buffered.
+        If writing fails the transaction is rolled back and the values and visits are buffered again.
+        """
+        pending, self.pending = self.pending, {}
+        pending_rounds, self.pending_rounds = self.pending_rounds, 0
+        self.flushed = time.perf_counter()
+        if not pending:
+            return
+        inserted = []
+        try:
+            updates = {'white_nodes': [], 'black_nodes': []}
+            new_nodes = []
+            for node, (value, visits) in pending.items():
+                node_id = self.get_node_id(node)
+                if node_id is None:
+                    new_nodes.append(node)
+                else:
+                    updates['{}_nodes'.format(node.color)].append((value, visits, node_id))
 
-            parent_id = node_id
-            node_id = self.get_node_id(node)
-            tbn = '{}_nodes'.format(node.color)
+            self.c.execute('BEGIN')
+            for tbn, data in updates.items():
+                if data:
+                    self.update_value_visits(data, tbn, mult=True)
+            new_nodes.sort(key=self.depth)
+            for node in new_nodes:
+                value, visits = pending[node]
+                self.insert(node, value, visits)
+                inserted.append(node)
+            self.c.execute('COMMIT')
+        except Exception:
+            if self.conn.in_transaction:
+                self.c.execute('ROLLBACK')
+            for node in inserted:
+                node.db_id = None
+            for node, (value, visits) in pending.items():
+                delta = self.pending.setdefault(node, [0, 0])
+                delta[0] += value
+                delta[1] += visits
+            self.pending_rounds += pending_rounds
+            raise
 
+    def depth(self, node):
+        """
+        Returns the amount of moves from self.root to given node.
+        :type node: Node
+        :rtype: int
+        """
+        depth = 0
+        while node is not self.root:
+            node = node.parent
+            depth += 1
+        return depth
+
+    def save_nodes_stats(self, stats, totals=None):
+        """
+        Adds value and visits to the rows of given nodes, inserts nodes not yet present with their total value and
+        visits. Parents of inserted nodes must already be in the db.
+        :param stats: (node, value, visits) for every node to be saved
+        :param totals: total (value, visits) of every node of stats, taken from the nodes if not given
+        :type stats: list, tuple
+        :type totals: list
+        """
+        self.flush()
+        if totals is None:
+            totals = [(node.value, node.visits) for node, value, visits in stats]
+        for (node, value, visits), (total_value, total_visits) in zip(stats, totals):
+            node_id = self.get_node_id(node)
             if node_id is not None:
-                points = settings.white_points if node.color == 'white' else settings.black_points
-                data = (points, settings.VISITS, node.branch_path)
-                self.update_value_visits(data, tbn)
+                self.update_value_visits((value, visits, node_id), '{}_nodes'.format(node.color))
             else:
-                data = (None,
-                        repr(node.state),
-                        repr(node.move),
-                        node.piece,
-                        node.index,
-                        repr(node.this_can_castle),
-                        repr(node.next_can_castle),
-                        node.value,
-                        node.visits,
-                        node.branch_path,
-                        parent_id)
-                self.insert_node(data, tbn)
+                self.insert(node, total_value, total_visits)
         self.conn.commit()
+
+    def get_node_id(self, node):
+        """
+        Returns the node_id of given node, None if it is not in the db. Remembered in node.db_id once known, nodes
+        not yet known are looked up by parent and index.
+        :param node: tree node
+        :type node: Node
+        :rtype: int, None
+        """
+        if node.db_id is None:
+            if node.parent is self.root:
+                parent_id = None
+            else:
+                parent_id = self.get_node_id(node.parent)
+                if parent_id is None:
+                    return None
+            node.db_id = self.get_child_id('{}_nodes'.format(node.color), parent_id, node.index)
+        return node.db_id
+
+    def insert(self, node, value, visits):
+        """
+        Inserts the row of given node, its parent must be in the db, and remembers its node_id in node.db_id.
+        :param node: tree node
+        :param value: value to store
+        :param visits: visits to store
+        :type node: Node
+        :type value: float
+        :type visits: int
+        """
+        parent_id = None if node.parent is self.root else node.parent.db_id
+        self.insert_node(self.node_row(node, parent_id, value, visits), '{}_nodes'.format(node.color))
+        node.db_id = self.c.lastrowid
+
+    def close(self):
+        """
+        Closes the connection, call self.flush() first.
+        """
+        self.conn.close()
+
+    @staticmethod
+    def node_row(node, parent_id, value, visits):
+        """
+        Returns the row to insert for given node, its move is stored packed. Positions are not stored, they are
+        replayed from the root by the moves of the path, see Node.position.
+        :param node: tree node
+        :param parent_id: node_id of the parent node, None for children of the root
+        :param value: value to store
+        :param visits: visits to store
+        :type node: Node
+        :type parent_id: int, None
+        :type value: float
+        :type visits: int
+        :rtype: tuple
+        """
+        return None, node.move, node.index, value, visits, parent_id
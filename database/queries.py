@@ -1,3 +1,13 @@
+from ast import literal_eval
+from chess.board import Board
+from chess.bitboard import QUEEN
+from chess.moves import encode_move, CASTLE
+
+SCHEMA_VERSION = 3
+
+NODES_COLUMNS = 'node_id, move, ind, value, visits, parent_id'
+
+
 class Queries:
     def __init__(self, connection):
         """
@@ -11,12 +21,39 @@ class Queries:
         self.setup()
 
     def setup(self):
-        self.create_nodes_table('white_nodes')
-        self.create_nodes_table('black_nodes')
+        """
+        Creates the nodes tables with a unique index on (parent_id, ind) and one on ind of the children of the root,
+        whose parent_id is NULL and so distinct to the first index. Tables of a schema before SCHEMA_VERSION are
+        migrated first, their moves are packed if they were saved before moves were packed, and the file is vacuumed
+        after. All of it is one transaction, raises ValueError and leaves the file unchanged if a move cannot be
+        packed.
+        """
+        self.conn.isolation_level = None
+        self.c.execute("BEGIN")
+        try:
+            tables = ('white_nodes', 'black_nodes')
+            for tbn in tables:
+                self.create_nodes_table(tbn)
+            old_tables = [tbn for tbn in tables if 'board' in self.get_columns(tbn)]
+            for tbn in old_tables:
+                self.pack_moves(tbn)
+            for tbn in tables:
+                if tbn in old_tables:
+                    self.migrate_nodes_table(tbn)
+                self.c.execute("""CREATE UNIQUE INDEX IF NOT EXISTS {tbn}_parent_ind
+                                  ON {tbn} (parent_id, ind)""".format(tbn=tbn))
+                self.c.execute("""CREATE UNIQUE INDEX IF NOT EXISTS {tbn}_root_ind
+                                  ON {tbn} (ind) WHERE parent_id IS NULL""".format(tbn=tbn))
+        except Exception:
+            self.c.execute("ROLLBACK")
+            raise
+        self.c.execute("COMMIT")
+        if old_tables:
+            self.c.execute("VACUUM")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.c.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
         self.c.execute("PRAGMA synchronous = OFF")
         self.c.execute("PRAGMA journal_mode = OFF")
-        self.conn.isolation_level = None
-        self.conn.commit()
 
     def create_nodes_table(self, tbn):
         """
@@ -24,17 +61,14 @@ class Queries:
 
         node_id         INTEGER not null
                             primary key autoincrement,
-        board           VARCHAR [350],
-        move            VARCHAR [6],
-        piece           VARCHAR [3],
+        move            INTEGER,
         ind             INT,
-        this_can_castle VARCHAR[27],
-        next_can_castle VARCHAR[27],
         value           INT,
         visits          INT,
-        branch_path     VARCHAR[200] UNIQUE,
         parent_id       INTEGER
 
+        Children of a node are identified by (parent_id, ind), parent_id is NULL for children of the root. Moves are
+        packed by chess.moves.encode_move, positions are not stored but replayed from the root.
         This does not set parent_id to foreign key! To do this call self.set_foreign_keys(color)
         :param tbn: table name
         :type tbn: str
@@ -43,42 +77,129 @@ class Queries:
                           (
                             node_id         INTEGER not null
                               primary key autoincrement,
-                            board           VARCHAR [350],
-                            move            VARCHAR [6],
-                            piece           VARCHAR [3],
+                            move            INTEGER,
                             ind             INT,
-                            this_can_castle VARCHAR[27],
-                            next_can_castle VARCHAR[27],
                             value           INT,
                             visits          INT,
-                            branch_path     VARCHAR[200] UNIQUE,
                             parent_id       INTEGER
                           )""".format(tbn=tbn))
 
+    def get_columns(self, tbn):
+        """
+        Returns the column names of given table.
+        :param tbn: table name
+        :type tbn: str
+        :rtype: list
+        """
+        return [row[1] for row in self.conn.execute("PRAGMA table_info({tbn})".format(tbn=tbn))]
+
+    def pack_moves(self, tbn, batch=10000):
+        """
+        Packs the moves of a nodes table saved before moves were packed, see chess.moves.encode_move. Those tables
+        stored the location moved to as text like '(5, 0)' and the piece moved in column piece, the location moved
+        from is found on the board of the parent row, or the start position for children of the root. Rows whose
+        move is already packed, an integer or a string of digits, are skipped. Call inside a transaction and before
+        the board and piece columns are dropped, raises ValueError for a move that cannot be packed.
+        :param tbn: table name, 'white_nodes' or 'black_nodes'
+        :param batch: amount of rows read and updated at once
+        :type tbn: str
+        :type batch: int
+        """
+        color = 'white' if tbn == 'white_nodes' else 'black'
+        parent_tbn = 'black_nodes' if color == 'white' else 'white_nodes'
+        start = Board().board
+        last_id = -1
+        while True:
+            self.c.execute("""SELECT child.node_id, child.move, child.piece, child.parent_id, parent.board
+                              FROM {tbn} AS child LEFT JOIN {parent_tbn} AS parent
+                              ON child.parent_id = parent.node_id
+                              WHERE child.node_id > ?
+                              AND typeof(child.move) != 'integer'
+                              AND NOT (typeof(child.move) = 'text' AND child.move != ''
+                                       AND child.move NOT GLOB '*[^0-9]*')
+                              ORDER BY child.node_id
+                              LIMIT ?""".format(tbn=tbn, parent_tbn=parent_tbn), (last_id, batch))
+            rows = self.c.fetchall()
+            if not rows:
+                return
+            moves = []
+            for node_id, move, piece, parent_id, board in rows:
+                if parent_id is None:
+                    board = start
+                elif board is None:
+                    raise ValueError('row {} of {} has no parent row, its move cannot be packed'.format(node_id, tbn))
+                else:
+                    board = literal_eval(board)
+                moves.append((self.pack_move(board, color, piece, literal_eval(move)), node_id))
+            self.c.executemany("UPDATE {tbn} SET move = ? WHERE node_id = ?".format(tbn=tbn), moves)
+            last_id = rows[-1][0]
+
+    @staticmethod
+    def pack_move(board, color, piece, to_loc):
+        """
+        Returns the packed move of given piece to given location on given board, see Match.encode_move.
+        :param board: 8 x 8 board of piece keys like 'wP3' the move is made on
+        :param color: side of the piece, 'white' or 'black'
+        :param piece: key of the piece without its color, like 'P3'
+        :param to_loc: location moved to
+        :type board: tuple, list
+        :type color: str
+        :type piece: str
+        :type to_loc: tuple
+        :rtype: int
+        """
+        key = color[0] + piece
+        for row, squares in enumerate(board):
+            if key in squares:
+                from_loc = (row, squares.index(key))
+                break
+        else:
+            raise ValueError('{} is not on the board, its move cannot be packed'.format(key))
+        promotion, flags = 0, 0
+        if piece[0] == 'P' and to_loc[0] == (0 if color == 'white' else 7):
+            promotion = QUEEN + 1
+        elif piece == 'K' and (to_loc[1] == from_loc[1] - 3 or to_loc[1] == from_loc[1] + 2):
+            flags = CASTLE
+        return encode_move(from_loc, tuple(to_loc), promotion, flags)
+
+    def migrate_nodes_table(self, tbn):
+        """
+        Copies a nodes table of schema version 1 or 2, which stored the board, piece and castling of every node, to
+        a table of the current schema and replaces it. The copy is checked before the old table is dropped, raises
+        ValueError if a row was not copied or its move is not an integer, call it inside a transaction.
+        :param tbn: table name
+        :type tbn: str
+        """
+        self.c.execute("DROP TABLE IF EXISTS {tbn}_migration".format(tbn=tbn))
+        self.create_nodes_table('{}_migration'.format(tbn))
+        self.c.execute("""INSERT INTO {tbn}_migration ({columns})
+                          SELECT node_id, CAST(move AS INTEGER), ind, value, visits, parent_id
+                          FROM {tbn}""".format(tbn=tbn, columns=NODES_COLUMNS))
+        self.c.execute("SELECT count(*) FROM {tbn}".format(tbn=tbn))
+        rows = self.c.fetchone()[0]
+        self.c.execute("""SELECT count(*) FROM {tbn}_migration
+                          WHERE typeof(move) = 'integer'""".format(tbn=tbn))
+        if self.c.fetchone()[0] != rows:
+            raise ValueError('migration of {} failed, not every row was copied with a packed move'.format(tbn))
+        self.c.execute("""DROP TABLE {tbn}""".format(tbn=tbn))
+        self.c.execute("""ALTER TABLE {tbn}_migration RENAME TO {tbn}""".format(tbn=tbn))
+
     def set_foreign_keys(self, color):
         other_color = 'black' if color == 'white' else 'white'
         create_temp = """CREATE TABLE {color}_nodes_dg_tmp
                             (
                             node_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-                            board VARCHAR[350],
-                            move VARCHAR[6],
-                            piece VARCHAR[3],
+                            move INTEGER,
                             ind INT,
-                            this_can_castle VARCHAR[27],
-                            next_can_castle VARCHAR[27],
                             value INT,
                             visits INT,
-                            branch_path VARCHAR[200] UNIQUE,
                             parent_id INTEGER
                             CONSTRAINT {color}_nodes_{other}_nodes__fk 
                             REFERENCES {other}_nodes ("node_id") ON UPDATE CASCADE
                             )""".format(color=color, other=other_color)
 
-        migrate_temp = """INSERT INTO {color}_nodes_dg_tmp
-                    (node_id, board, move, piece, ind, this_can_castle, next_can_castle, value, visits, parent_id) 
-                    
-                    SELECT node_id, board, move, piece, ind, this_can_castle, next_can_castle, value, visits, parent_id
-                    FROM {color}_nodes""".format(color=color)
+        migrate_temp = """INSERT INTO {color}_nodes_dg_tmp ({columns})
+                    SELECT {columns} FROM {color}_nodes""".format(color=color, columns=NODES_COLUMNS)
 
         drop = """DROP TABLE {color}_nodes""".format(color=color)
 
@@ -99,17 +220,17 @@ class Queries:
         :type mult: bool
         """
         query_mode = self.c.execute if not mult else self.c.executemany
-        query_mode("""INSERT INTO {tbn} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""".format(tbn=tbn), data)
+        query_mode("""INSERT INTO {tbn} VALUES (?, ?, ?, ?, ?, ?)""".format(tbn=tbn), data)
 
     def update_value_visits(self, data, tbn, mult=False):
         """
         Update the value and visits of given nodes as:
 
                     UPDATE {tbn}
-                    SET value = node.value, visits = node.visits
-                    WHERE branch_path = node.branch_path;
+                    SET value = value + ?, visits = visits + ?
+                    WHERE node_id = ?;
 
-        :param data: rows to be updated
+        :param data: (value, visits, node_id) of the rows to be updated
         :param tbn: name of table, 'white_nodes' or 'black_nodes'
         :param mult: True if updating multiple rows in one call
         :type data: list, tuple
@@ -120,59 +241,38 @@ class Queries:
         query_mode = self.c.execute if not mult else self.c.executemany
         query = """UPDATE {tbn}
                    SET value = value + ?, visits = visits + ?
-                   WHERE branch_path = ?""".format(tbn=tbn)
+                   WHERE node_id = ?""".format(tbn=tbn)
         query_mode(query, data)
 
-    def get_nodes(self, tbn, parent_id):
+    def get_all_nodes(self, tbn):
         """
-        Returns a list of rows containing data for .origin.node
+        Returns the rows of all nodes of given table needed to build the tree, ordered by parent and index.
         :param tbn: table name to get nodes from
-        :param parent_id: node_id of parent node, if root node parent_id should be None
-        :type parent_id: int, None
         :type tbn: str
-        :return: list of dictionaries with node data
+        :return: (node_id, move, ind, value, visits, parent_id) rows
         :rtype: list
         """
-        if parent_id is None:
-            self.c.execute("""SELECT * FROM {tbn} 
-                              WHERE parent_id ISNULL
-                              ORDER BY ind ASC""".format(tbn=tbn))
-        else:
-            self.c.execute("""SELECT * FROM {tbn} 
-                              WHERE parent_id = ?
-                              ORDER BY ind ASC""".format(tbn=tbn), (parent_id, ))
-
-        nodes = self.c.fetchall()
-        if not nodes:
-            return None
-
-        keys = ('node_id', 'board', 'move', 'piece', 'ind', 'tcc', 'ncc', 'val', 'visits', 'branch_path')
-        new_nodes = []
-
-        for row in nodes:
-            nodes_dict = {}
-            for col, key in zip(row, keys):
-                nodes_dict[key] = col
-            new_nodes.append(nodes_dict)
-
-        return new_nodes
+        self.c.execute("""SELECT node_id, move, ind, value, visits, parent_id FROM {tbn}
+                          ORDER BY parent_id, ind""".format(tbn=tbn))
+        return self.c.fetchall()
 
-    def get_node_id(self, node):
+    def get_child_id(self, tbn, parent_id, ind):
         """
-        Get primary key for given node.
-        :param node: tree node
-        :type node: Node
-        :return: node_id
-        :rtype: int
+        Get primary key of the child at given index of given parent.
+        :param tbn: table name of the child
+        :param parent_id: node_id of the parent, None for children of the root
+        :param ind: index of the child in its parent's nodes
+        :type tbn: str
+        :type parent_id: int, None
+        :type ind: int
+        :return: node_id, None if not present
+        :rtype: int, None
         """
-        table = '{}_nodes'.format(node.color)
-        self.c.execute("""SELECT node_id FROM {tbn}
-                          WHERE branch_path = ? LIMIT 1"""
-                       .format(tbn=table), (node.branch_path, ))
-
-        parent_id = self.c.fetchone()
-
         if parent_id is None:
-            return parent_id
+            self.c.execute("""SELECT node_id FROM {tbn}
+                              WHERE parent_id IS NULL AND ind = ?""".format(tbn=tbn), (ind, ))
         else:
-            return parent_id[0]
+            self.c.execute("""SELECT node_id FROM {tbn}
+                              WHERE parent_id = ? AND ind = ?""".format(tbn=tbn), (parent_id, ind))
+        node_id = self.c.fetchall()
+        return node_id[0][0] if node_id else None
@@ -0,0 +1,166 @@
+import queue
+import threading
+import settings
+from database.database import Database
+
+
+class Writer:
+    """
+    Writes to the db from a background thread which owns the sqlite3 connection, so training does not wait for
+    sqlite. Walks are handed over through a queue of at most settings.WRITER_QUEUE_SIZE walks, a full queue makes
+    self.buffer_walk wait for the thread. Has the methods of Database used by Origin, those returning a result or
+    a loaded tree wait until the thread ran them, call self.flush() as a barrier at checkpoints and shutdown.
+    """
+    def __init__(self, root, fn=r'C:\pythonprojects\chess_prod\database\nodes.db', maxsize=settings.WRITER_QUEUE_SIZE):
+        """
+        Starts the writer thread, it opens the Database of given root and file.
+        :param root: root of chess game tree
+        :param fn: path to sqlite database file
+        :param maxsize: amount of tasks the queue holds before self.buffer_walk waits
+        :type root: origin.Origin
+        :type fn: str
+        :type maxsize: int
+        """
+        self.fn = fn
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, args=(root, fn), daemon=True)
+        self.thread.start()
+
+    def run(self, root, fn):
+        """
+        Runs the tasks of self.queue in the writer thread until self.close() is called. Buffered walks are flushed
+        after settings.SAVE_SECONDS without a task too. An error opening, flushing or closing the db stops the thread,
+        it is kept in self.error and handed to every call still waiting, see self.release().
+        :param root: root of chess game tree
+        :param fn: path to sqlite database file
+        :type root: origin.Origin
+        :type fn: str
+        """
+        database = None
+        try:
+            database = Database(root, fn=fn)
+            while True:
+                try:
+                    method, args, done = self.queue.get(timeout=settings.SAVE_SECONDS)
+                except queue.Empty:
+                    method, args, done = 'flush', (), None
+                if method is None:
+                    break
+                try:
+                    result = getattr(database, method)(*args)
+                except Exception as error:
+                    result = error
+                    if done is None:
+                        self.error = error
+                if done is not None:
+                    done.append(result)
+                    done.event.set()
+            database.flush()
+        except Exception as error:
+            self.error = error
+        finally:
+            try:
+                if database is not None:
+                    database.close()
+            except Exception as error:
+                if self.error is None:
+                    self.error = error
+            self.release()
+
+    def release(self):
+        """
+        Empties self.queue when the writer thread stops, calls that are waited for get self.error, or an error
+        telling the writer is not running.
+        """
+        while True:
+            try:
+                method, args, done = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if done is not None:
+                done.append(self.error or RuntimeError('writer of {} is not running'.format(self.fn)))
+                done.event.set()
+
+    def put(self, method, *args, wait=False):
+        """
+        Queues a call of a Database method for the writer thread, raises the error of a previous call that was not
+        waited for, or RuntimeError if the writer thread stopped.
+        :param method: name of the Database method
+        :param args: its arguments
+        :param wait: waits for the call and returns its result, raises its error, if True
+        :type method: str
+        :type wait: bool
+        """
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        if not self.thread.is_alive():
+            raise RuntimeError('writer of {} is not running'.format(self.fn))
+        done = None
+        if wait:
+            done = Done()
+        self.queue.put((method, args, done))
+        if wait:
+            while not done.event.wait(settings.SAVE_SECONDS):
+                if not self.thread.is_alive():
+                    self.release()
+            result = done.pop()
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+    def buffer_walk(self, nodes, context):
+        """
+        Queues the value and visits of given walk, see Database.buffer_walk. They are taken now, so the context can
+        be reused right away.
+        :param nodes: nodes walked last training round
+        :param context: context of the training round, holds the points earned
+        :type nodes: list, tuple
+        :type context: SearchContext
+        """
+        self.put('buffer_deltas', [(node, context.points(node.color), settings.VISITS) for node in nodes])
+
+    def save_nodes_stats(self, stats):
+        """
+        Queues the statistics of merged nodes, see Database.save_nodes_stats. Their totals are taken now, later
+        merges do not change what is inserted.
+        :param stats: (node, value, visits) for every node to be saved
+        :type stats: list, tuple
+        """
+        self.put('save_nodes_stats', stats, [(node.value, node.visits) for node, value, visits in stats])
+
+    def load(self, root):
+        """
+        Loads the db to given root in the writer thread and waits for it, see Database.load.
+        :param root: root of chess game tree
+        :type root: origin.Origin
+        """
+        self.put('load', root, wait=True)
+
+    def flush(self):
+        """
+        Waits until every walk queued is written to the db.
+        """
+        self.put('flush', wait=True)
+
+    def close(self):
+        """
+        Writes what is queued and buffered, closes the connection and stops the writer thread. Raises the error that
+        stopped the thread, or of a call that was not waited for.
+        """
+        if self.thread.is_alive():
+            self.queue.put((None, (), None))
+        self.thread.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+
+class Done(list):
+    """
+    List subclass, holds the result of a call run by the writer thread, self.event is set once it is in.
+    """
+    def __init__(self):
+        super().__init__()
+        self.event = threading.Event()
@@ -0,0 +1,308 @@
+"""
+Opt-in instrumentation of the hot paths of training. enable() wraps the functions of HOT_PATHS with counters and
+timers and disable() puts the originals back, so while disabled the trained code runs unchanged and costs nothing.
+A summary of calls and seconds is printed every interval seconds of training, and Sampler or sample_window attach
+a sampling profiler for a window of time.
+
+Seconds are inclusive, the seconds of Node.train contain those of the nodes it trains and of their games. Modules
+compiled by compile.py do not create Python frames, their functions are only seen by the sampling profiler when
+running from source.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from importlib import import_module
+
+import settings
+
+# module, class, function
+HOT_PATHS = (
+    ('origin.origin', 'Origin', 'train'),
+    ('origin.node', 'Node', 'train'),
+    ('origin.node', 'Node', 'expand'),
+    ('origin.node', 'Node', 'simulate'),
+    ('chess.match', 'Match', '__init__'),
+    ('chess.match', 'Match', 'make_move'),
+    ('chess.match', 'Match', 'moves_safety_check'),
+    ('database.database', 'Database', 'flush'),
+)
+
+# module, class, function of the training loops, the summary is printed when one of them returns
+TRAIN_LOOPS = (
+    ('origin.origin', 'Origin', 'train'),
+    ('origin.parallel', 'TreeParallel', 'train'),
+    ('origin.parallel', 'RootParallel', 'train'),
+)
+
+_probes = None
+
+
+class Probes:
+    """
+    Counters and timers installed by wrapping functions, self.restore() puts the original functions back.
+    Attributes:
+        calls = {}, calls or counted amounts by name
+        seconds = {}, seconds spent by name, only for timed functions
+    """
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+        self.patched = []
+
+    def wrap(self, owner, name, wrapper):
+        """
+        Replaces attribute name of owner by wrapper(original), the original is put back by self.restore().
+        :param owner: class or module owning the function
+        :param name: name of the function
+        :param wrapper: returns the replacement of the function it is given
+        :type name: str
+        :type wrapper: function
+        """
+        original = getattr(owner, name)
+        self.patched.append((owner, name, original))
+        setattr(owner, name, wrapper(original))
+
+    def count(self, owner, name, key, amount=None):
+        """
+        Counts the calls of a function under key, or the amount amount(args, result) returns for every call.
+        :param owner: class or module owning the function
+        :param name: name of the function
+        :param key: name of the count
+        :param amount: returns the amount to count for the positional arguments and the result of a call
+        :type name: str
+        :type key: str
+        :type amount: function
+        """
+        calls = self.calls
+        calls[key] = 0
+
+        def wrapper(func):
+            def counted(*args, **kwargs):
+                result = func(*args, **kwargs)
+                calls[key] += 1 if amount is None else amount(args, result)
+                return result
+            return counted
+        self.wrap(owner, name, wrapper)
+
+    def time(self, owner, name, key):
+        """
+        Counts the calls of a function and adds the seconds spent in it under key.
+        :param owner: class or module owning the function
+        :param name: name of the function
+        :param key: name of the count and total
+        :type name: str
+        :type key: str
+        """
+        calls, seconds = self.calls, self.seconds
+        calls[key], seconds[key] = 0, 0.
+        perf_counter = time.perf_counter
+
+        def wrapper(func):
+            def timed(*args, **kwargs):
+                before = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    seconds[key] += perf_counter() - before
+                    calls[key] += 1
+            return timed
+        self.wrap(owner, name, wrapper)
+
+    def restore(self):
+        """
+        Puts back the functions replaced, last replaced first.
+        """
+        while self.patched:
+            owner, name, original = self.patched.pop()
+            setattr(owner, name, original)
+
+    def summary(self):
+        """
+        Returns a table of the calls, seconds and microseconds per call of every name.
+        :rtype: str
+        """
+        lines = ['{:<32}{:>12}{:>12}{:>12}'.format('name', 'calls', 'seconds', 'us/call')]
+        for key, calls in self.calls.items():
+            if key in self.seconds:
+                seconds = self.seconds[key]
+                per_call = seconds / calls * 1e6 if calls else 0
+                lines.append('{:<32}{:>12}{:>12.3f}{:>12.1f}'.format(key, calls, seconds, per_call))
+            else:
+                lines.append('{:<32}{:>12}'.format(key, calls))
+        return '\n'.join(lines)
+
+
+def enable(interval=settings.INSTRUMENT_INTERVAL, out=sys.stderr):
+    """
+    Times every function of HOT_PATHS until disable() is called, does nothing if already enabled.
+    :param interval: prints the summary after the call of a function of TRAIN_LOOPS ending at least interval
+                     seconds after the previous summary, None never does
+    :param out: stream to print the summaries to
+    :type interval: float
+    :return: probes holding the counts and seconds
+    :rtype: Probes
+    """
+    global _probes
+    if _probes is not None:
+        return _probes
+    _probes = Probes()
+    for module, cls, name in HOT_PATHS:
+        _probes.time(getattr(import_module(module), cls), name, cls + '.' + name)
+    if interval is not None:
+        probes, last = _probes, [time.perf_counter()]
+
+        def wrapper(func):
+            def reported(*args, **kwargs):
+                result = func(*args, **kwargs)
+                if time.perf_counter() - last[0] >= interval:
+                    last[0] = time.perf_counter()
+                    print(probes.summary(), file=out, flush=True)
+                return result
+            return reported
+        for module, cls, name in TRAIN_LOOPS:
+            _probes.wrap(getattr(import_module(module), cls), name, wrapper)
+    return _probes
+
+
+def disable():
+    """
+    Puts back the functions wrapped by enable().
+    :return: probes holding the counts and seconds, None if not enabled
+    :rtype: Probes
+    """
+    global _probes
+    probes, _probes = _probes, None
+    if probes is not None:
+        probes.restore()
+    return probes
+
+
+def enabled():
+    """
+    :return: True if enable() was called without disable()
+    :rtype: bool
+    """
+    return _probes is not None
+
+
+class Sampler:
+    """
+    Sampling profiler. A daemon thread looks at the frame one thread is executing every interval seconds and
+    counts the functions it is in, both the innermost function (own) and every function on the stack (inclusive).
+    Use as context manager or call start() and stop().
+    """
+    def __init__(self, interval=0.001, thread=None):
+        """
+        :param interval: seconds between two samples
+        :param thread: thread to sample, default is the main thread
+        :type interval: float
+        :type thread: threading.Thread
+        """
+        self.interval = interval
+        self.thread_id = (threading.main_thread() if thread is None else thread).ident
+        self.own = Counter()
+        self.inclusive = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self, seconds=None, out=None):
+        """
+        Starts sampling in a daemon thread.
+        :param seconds: stops sampling after this many seconds, None samples until self.stop() is called
+        :param out: stream to print the summary to when sampling stopped after seconds
+        :type seconds: float
+        :rtype: Sampler
+        """
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, args=(seconds, out), daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self, seconds, out):
+        """
+        Samples until stopped or until seconds passed, runs in the sampling thread.
+        :param seconds: seconds to sample, None samples until stopped
+        :param out: stream to print the summary to after seconds, None does not print
+        :type seconds: float
+        """
+        end = None if seconds is None else time.perf_counter() + seconds
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.sample(frame)
+            if end is not None and time.perf_counter() >= end:
+                break
+        if seconds is not None and out is not None:
+            print(self.summary(), file=out, flush=True)
+
+    def sample(self, frame):
+        """
+        Counts the functions of one stack.
+        :param frame: innermost frame of the sampled thread
+        :type frame: frame
+        """
+        self.samples += 1
+        self.own[self.function(frame)] += 1
+        seen = set()
+        while frame is not None:
+            seen.add(self.function(frame))
+            frame = frame.f_back
+        self.inclusive.update(seen)
+
+    @staticmethod
+    def function(frame):
+        """
+        Returns file, first line and name of the function of given frame.
+        :rtype: str
+        """
+        code = frame.f_code
+        return '{}:{}({})'.format(code.co_filename, code.co_firstlineno, code.co_name)
+
+    def stop(self):
+        """
+        Stops sampling and waits for the sampling thread.
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def summary(self, n=20):
+        """
+        Returns the n functions sampled most often by own and by inclusive samples as a share of all samples.
+        :param n: amount of functions of each list
+        :type n: int
+        :rtype: str
+        """
+        lines = ['{} samples'.format(self.samples), 'own:']
+        for counter in (self.own, self.inclusive):
+            for function, count in counter.most_common(n):
+                lines.append('{:>7.1%}  {}'.format(count / self.samples if self.samples else 0, function))
+            if counter is self.own:
+                lines.append('inclusive:')
+        return '\n'.join(lines)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def sample_window(seconds, interval=0.001, thread=None, out=sys.stderr):
+    """
+    Samples the main thread, or given thread, for given seconds while it keeps running and prints the summary.
+    :param seconds: length of the window
+    :param interval: seconds between two samples
+    :param thread: thread to sample, default is the main thread
+    :param out: stream to print the summary to
+    :type seconds: float
+    :type interval: float
+    :type thread: threading.Thread
+    :return: the sampler, its counts are complete once its thread ended
+    :rtype: Sampler
+    """
+    return Sampler(interval, thread).start(seconds, out)
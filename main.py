@@ -1,4 +1,6 @@
 from origin.origin import Origin
+from origin.parallel import RootParallel, TreeParallel, playout_pool
+import instrumentation
 import settings
 from datetime import datetime
 
@@ -26,45 +28,119 @@ def measure_time(func, args=False, num_runs=1000):
 
 def dynamic_save(origin):
     """
-    First saves walked nodes to db then trains again.
+    First buffers walked nodes for the db then trains again, see Origin.save_walk.
     :param origin: chess game tree
     :type origin: Origin
     """
-    origin.save_walk(settings.walked_nodes)
+    origin.save_walk()
     origin.train()
 
 
-def main(load=False, p_runtime=True, sync=True, n=999999999999):
+def root_parallel(origin, processes, p_runtime=True, sync=True, n=999999999999):
+    """
+    Trains given tree with worker processes which each grow their own tree, see RootParallel.
+    :param origin: chess game tree
+    :param processes: amount of worker processes
+    :param p_runtime: prints runtime per merge if True
+    :param sync: set True for saving merged statistics to database
+    :param n: amount of merges
+    :type origin: Origin
+    :type processes: int
+    :type p_runtime: bool
+    :type sync: bool
+    :type n: int
+    """
+    with RootParallel(origin, processes) as trainer:
+        run_times = []
+        for rnd in range(n):
+            run_times.append(measure_time(trainer.train, args=(sync, ), num_runs=1))
+            if p_runtime:
+                print(rnd, sum(run_times) / len(run_times))
+
+
+def tree_parallel(origin, processes, p_runtime=True, sync=True, n=999999999999):
+    """
+    Trains given tree with as many descents in flight as worker processes, see TreeParallel.
+    :param origin: chess game tree
+    :param processes: amount of worker processes
+    :param p_runtime: prints runtime per round if True
+    :param sync: set True for saving progress to database
+    :param n: amount of training rounds
+    :type origin: Origin
+    :type processes: int
+    :type p_runtime: bool
+    :type sync: bool
+    :type n: int
+    """
+    with TreeParallel(origin, processes) as trainer:
+        run_times = []
+        for rnd in range(n):
+            run_times.append(measure_time(trainer.train, args=(1, sync), num_runs=1))
+            if p_runtime:
+                print(rnd, sum(run_times) / len(run_times))
+
+
+def main(load=False, p_runtime=True, sync=True, n=999999999999, processes=1, leaf_processes=1,
+         tree_processes=1, instrument=settings.INSTRUMENT):
     """
     Creates game tree root and trains for n rounds.
     :param load: loads database to tree if true
     :param p_runtime: prints runtime per round if True
     :param sync: set True for saving progress to database
-    :param n: amount of training rounds
+    :param n: amount of training rounds, amount of merges if processes > 1
+    :param processes: trains root parallel with this amount of worker processes if more than 1
+    :param leaf_processes: plays the games of each roll out with this amount of worker processes if more than 1
+    :param tree_processes: trains tree parallel with this amount of worker processes if more than 1
+    :param instrument: times the hot paths of training in this process and prints a summary every
+                       settings.INSTRUMENT_INTERVAL seconds and at the end, see instrumentation
     :type load: bool
     :type p_runtime: bool
     :type sync: bool
     :type n: int
+    :type processes: int
+    :type leaf_processes: int
+    :type tree_processes: int
+    :type instrument: bool
     """
+    if instrument:
+        instrumentation.enable()
+        try:
+            return main(load, p_runtime, sync, n, processes, leaf_processes, tree_processes, instrument=False)
+        finally:
+            print(instrumentation.disable().summary())
 
     origin = Origin()
     if load:
         origin.load()
+    if leaf_processes > 1:
+        origin.context.pool = playout_pool(leaf_processes)
 
-    if sync and p_runtime:
-        origin.train()
-        run_times = []
-        for rnd in range(n):
-            run_times.append(measure_time(dynamic_save, args=(origin, ), num_runs=1))
-            print(rnd, sum(run_times) / len(run_times))
+    try:
+        if processes > 1:
+            root_parallel(origin, processes, p_runtime=p_runtime, sync=sync, n=n)
 
-    elif sync:
-        origin.train()
-        for rnd in range(n):
-            dynamic_save(origin)
-    else:
-        for rnd in range(n):
+        elif tree_processes > 1:
+            tree_parallel(origin, tree_processes, p_runtime=p_runtime, sync=sync, n=n)
+
+        elif sync and p_runtime:
+            origin.train()
+            run_times = []
+            for rnd in range(n):
+                run_times.append(measure_time(dynamic_save, args=(origin, ), num_runs=1))
+                print(rnd, sum(run_times) / len(run_times))
+
+        elif sync:
             origin.train()
+            for rnd in range(n):
+                dynamic_save(origin)
+        else:
+            for rnd in range(n):
+                origin.train()
+    finally:
+        origin.close()
+        if origin.context.pool is not None:
+            origin.context.pool.close()
+            origin.context.pool.join()
 
 
 if __name__ == '__main__':
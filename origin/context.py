@@ -0,0 +1,56 @@
+class SearchContext:
+    """
+    Mutable state of one search of a game tree, passed through the train, update and save calls so several trees
+    can be searched in one process.
+    """
+    def __init__(self, tot_n=0, pool=None):
+        """
+        Creates a context for a search of a tree with tot_n visits.
+        Attributes:
+            walked_nodes = []
+            path = []
+            tot_n = tot_n
+            white_points = 0
+            black_points = 0
+            pool = pool
+            deferred = False
+            playout = None
+        :param tot_n: total visits of the game tree
+        :param pool: process pool playing the settings.NUM_SIMULATIONS games of a roll out, None to play them here
+        :type tot_n: int
+        :type pool: multiprocessing.pool.Pool
+        """
+        self.pool = pool
+        self.deferred = False
+        self.playout = None
+        self.walked_nodes = []
+        self.path = []
+        self.tot_n = tot_n
+        self.white_points = 0
+        self.black_points = 0
+
+    def init_tot_n(self, n=0):
+        """
+        Initializes total visits = n = tot_n. If save was loaded, the sum of Origin.nodes.visits should be passed.
+        :param n: total visits of game tree
+        :type n: int
+        """
+        self.tot_n = n
+
+    def init_path_value(self):
+        """
+        Resets path of traversal, walked nodes, deferred playout, points earned by white and points earned by black.
+        """
+        self.playout = None
+        self.white_points, self.black_points = 0, 0
+        self.path = []
+        self.walked_nodes = []
+
+    def points(self, color):
+        """
+        Returns points earned by given color in this training round.
+        :param color: either 'white' or 'black'
+        :type color: str
+        :rtype: float
+        """
+        return self.white_points if color == 'white' else self.black_points
@@ -1,130 +1,143 @@
 import settings
 from math import sqrt, log
-from chess import match as mch, chess_functions as cf
-import copy
-from chess.moves import convert_to_fen, load_fen
+from chess import match as mch
 
 
 class Node:
     """
-    Node in chess game tree.
+    Node in chess game tree. A node does not keep its board, its position is replayed from the root when needed,
+    see position. Nodes created by expand are lazy, until their first visit they only know their parent and
+    move, see materialize. Moves are packed ints, see chess.moves.encode_move.
     """
     C = settings.C
+    __slots__ = ('parent', 'color', 'move', 'index', 'value', 'visits', 'nodes', 'win', 'draw', 'legal_moves',
+                 'db_id')
 
-    def __init__(self, state, color, move, piece, index, branch_path, this_can_castle, next_can_castle, v=0, n=0):
+    def __init__(self, parent, color, move, index, v=0, n=0, db_id=None):
         """
-        If given state is a fen converts fen to list of lists, checks if this is a leaf node (checkmate or draw)
-        :param state (str, list, tuple): either a fen or tuple/list of 8 lists
+        Creates a lazy node, its position is computed by self.materialize() on the first visit.
+        :param parent (Node, Origin): node in whose position move is played
         :param color (str): side of this node, either 'white' or 'black'
-        :param move (tuple): coordinates
-        :param piece (str): string of piece belonging to move
+        :param move (int): packed move, see chess.moves.encode_move
         :param index (int): index of this node in parent node.nodes
-        :param branch_path (str): a string specifying the path to this node
-        :param this_can_castle (dict): castling availability for this node
-        :param next_can_castle (dict): castling availability for next node
         :param v (int): value of this node, if created while expanding in parent node v=0
         :param n (int): visits to this node, if created while expanding in parent node n=0
+        :param db_id (int): node_id of this node's row in the database, None until it is saved or if not loaded
         """
-
-        self.branch_path = branch_path
+        self.parent = parent
+        self.color = color
+        self.move = move
         self.index = index
-        self.move = copy.deepcopy(move)
-        self.piece = copy.deepcopy(piece)
         self.value = v
         self.visits = n
-        self.nodes = []
-        self.color = color
-        self.next_can_castle = copy.deepcopy(next_can_castle)
-        self.this_can_castle = copy.deepcopy(this_can_castle)
-
-        if self.color == 'white':
-            self.white_can_castle = copy.deepcopy(self.this_can_castle)
-            self.black_can_castle = copy.deepcopy(self.next_can_castle)
-        else:
-            self.white_can_castle = copy.deepcopy(self.next_can_castle)
-            self.black_can_castle = copy.deepcopy(self.this_can_castle)
-
-        if type(state) == str:
-            self.state, self.opp = load_fen(state)
-            self.fen = state
-        else:
-            self.state = state
-            self.opp = 'black' if self.color == 'white' else 'white'
-            self.fen = convert_to_fen(state, self.opp,
-                                      self.white_can_castle['ks'],
-                                      self.white_can_castle['qs'],
-                                      self.black_can_castle['ks'],
-                                      self.black_can_castle['qs'], )
-
-        self.win = cf.checkmate(self.state, self.opp,
-                                self.white_can_castle['ks'], self.white_can_castle['qs'],
-                                self.black_can_castle['ks'], self.black_can_castle['qs'])
-        if not self.win:
-            moves, pieces = cf.get_moves_pieces(self.state, self.opp,
-                                                self.white_can_castle['ks'], self.white_can_castle['qs'],
-                                                self.black_can_castle['ks'], self.black_can_castle['qs'])
-
-            self.draw = True if not moves else False
-        else:
-            self.draw = False
+        self.nodes = ()
+        self.win = None
+        self.draw = None
+        self.legal_moves = None
+        self.db_id = db_id
+
+    @property
+    def opp(self):
+        """
+        Side to move in this node's position.
+        :rtype: str
+        """
+        return 'black' if self.color == 'white' else 'white'
 
-    def expand(self):
+    @property
+    def materialized(self):
         """
-        Generates children nodes for each move available of this node. Checks if a king or rook moved.
+        True once terminal status and legal moves of this node are known.
+        :rtype: bool
         """
-        moves, pieces = cf.get_moves_pieces(self.state, self.opp,
-                                            self.white_can_castle['ks'], self.white_can_castle['qs'],
-                                            self.black_can_castle['ks'], self.black_can_castle['qs'])
+        return self.win is not None
 
-        opp_can_castle, i_can_castle = {}, {}
-        i_can_castle['ks'], i_can_castle['qs'] = self.this_can_castle['ks'], self.this_can_castle['qs']
+    @property
+    def branch_path(self):
+        """
+        A string specifying the path to this node.
+        :rtype: str
+        """
+        return self.parent.child_branch_path(self.index)
 
-        index = 0
-        for key in moves:
+    def child_branch_path(self, index):
+        """
+        Returns branch path of the child at given index of self.nodes.
+        :type index: int
+        :rtype: str
+        """
+        return self.branch_path + 's' + str(index)
 
-            piece = pieces[key]
-            opp_can_castle['ks'], opp_can_castle['qs'] = self.next_can_castle['ks'], self.next_can_castle['qs']
+    def play(self, match):
+        """
+        Plays self.move on given match, which must be in the parent's position. Every move is replayed as if it
+        were the first move of the match, so the 50 moves rule only applies inside simulated games.
+        :param match: match in the parent's position, is modified
+        :type match: Match
+        :return: given match, now in this node's position with self.opp to move
+        :rtype: Match
+        """
+        match.continuous_non_capped_turns = 0
+        match.make_encoded_move(self.move)
+        match.continuous_non_capped_turns = 0
+        return match
 
-            if key == 'K':
-                opp_can_castle['ks'], opp_can_castle['qs'] = False, False
-            elif key == 'R1':
-                opp_can_castle['qs'] = False
-            elif key == 'R2':
-                opp_can_castle['ks'] = False
+    def position(self):
+        """
+        Returns a new Match in this node's position with self.opp to move, made by replaying the moves from the root.
+        :rtype: Match
+        """
+        return self.play(self.parent.position())
 
-            for move in moves[key]:
-                branch_path = self.branch_path + 's' + str(index)
-                sim_board = copy.deepcopy(self.state)
-                board_state = cf.get_branch(piece, move, sim_board, self.opp)
+    def materialize(self, match=None):
+        """
+        Takes terminal status and legal moves of a lazy node from its position, the legal moves are kept for
+        self.expand(). Does nothing if already done.
+        :param match: match in this node's position, replayed from the root if not given
+        :type match: Match
+        """
+        if self.materialized:
+            return
+        match = self.position() if match is None else match
+        self.win = match.check_mate
+        if not self.win:
+            self.legal_moves = match.legal_moves(self.opp)
+            self.draw = True if not self.legal_moves else False
+        else:
+            self.draw = False
 
-                self.nodes.append(Node(board_state, self.opp, move, key,
-                                       index, branch_path,
-                                       opp_can_castle, i_can_castle))
-                index += 1
+    def expand(self):
+        """
+        Generates a lazy child node for each legal move kept in self.legal_moves.
+        """
+        self.nodes = [Node(self, self.opp, move, index) for index, move in enumerate(self.legal_moves)]
+        self.legal_moves = None
 
-    def update(self, layer):
+    def update(self, layer, context):
         """
         Adds value of previous training round to this node's children node's value and calls update at that node.
-        :param layer: index for settings.path to get node to be updated
+        :param layer: index for context.path to get node to be updated
+        :param context: context of the search
         :type layer: int
+        :type context: SearchContext
         """
 
-        points = settings.white_points if self.opp == 'white' else settings.black_points
-        ind = settings.path[layer]
+        points = context.white_points if self.opp == 'white' else context.black_points
+        ind = context.path[layer]
         self.nodes[ind].value += points
-        self.value += settings.white_points if layer == 0 else 0
+        self.value += context.white_points if layer == 0 else 0
 
-        if len(settings.path) - 1 > layer:
+        if len(context.path) - 1 > layer:
             layer += 1
-            self.nodes[ind].update(layer)
+            self.nodes[ind].update(layer, context)
         else:
             return
 
-    def train(self):
+    def train(self, context):
         """
         We begin by adding a visit to self.visits or more if otherwise specified in settings.
-        Then add our index to settings.path,
-        And add self to settings.walked_nodes.
+        Then add our index to context.path,
+        And add self to context.walked_nodes.
 
         Decides child to walk in 3 possible actions:
 
@@ -132,15 +145,18 @@ class Node:
         if we have a node still unvisited we call that node's roll_out(),
         otherwise we roll_out() the node which maximizes the UCB1 function.
 
-        if this is a leaf node we return after updating settings.black_points and settings.white_points
+        if this is a leaf node we return after updating context.black_points and context.white_points
+        :param context: context of the search
+        :type context: SearchContext
         """
+        self.materialize()
         self.visits += settings.VISITS
-        settings.path.append(self.index)
-        settings.walked_nodes.append(self)
+        context.path.append(self.index)
+        context.walked_nodes.append(self)
         if not self.nodes:
 
-            this_points = settings.black_points if self.color == 'black' else settings.white_points
-            opp_points = settings.white_points if this_points == settings.black_points else settings.black_points
+            this_points = context.black_points if self.color == 'black' else context.white_points
+            opp_points = context.white_points if this_points == context.black_points else context.black_points
 
             if self.draw:
                 this_points += (settings.DRAW * settings.VISITS) / 2
@@ -152,61 +168,88 @@ class Node:
                 return
             else:
                 self.expand()
-                self.nodes[0].roll_out()
+                self.nodes[0].roll_out(context)
                 return
 
         values = []
 
         for node in self.nodes:
             if node.visits == 0:
-                node.roll_out()
+                node.roll_out(context)
                 return
 
             val_1 = node.value / node.visits
-            val_2 = self.C * sqrt(log(settings.tot_n) / node.visits)
+            val_2 = self.C * sqrt(log(context.tot_n) / node.visits)
             values.append(val_1 + val_2)
 
         hi_value = max(values)
 
         for i, v in enumerate(values):
             if v == hi_value:
-                self.nodes[i].train()
+                self.nodes[i].train(context)
                 return
 
-    def simulate(self):
+    def simulate(self, context, match=None):
         """
-        Simulates a random game and adds earned points to settings.white_points and settings.black_points
+        Simulates settings.NUM_SIMULATIONS random games, in context.pool if set, with the playout engine of
+        chess.playout if settings.FAST_PLAYOUTS and in lockstep with chess.batch_playout if there are at least
+        settings.BATCH_PLAYOUTS, and adds earned points to context.white_points and context.black_points.
+        Terminal nodes earn the points of as many games.
+        If context.deferred the games are not played, self and match are left in context.playout instead.
+        :param context: context of the search
+        :param match: match in this node's position, replayed from the root if not given
+        :type context: SearchContext
+        :type match: Match
         """
         if self.win:
             if self.color == 'white':
-                settings.white_points += settings.WIN
+                context.white_points += settings.WIN * settings.NUM_SIMULATIONS
             else:
-                settings.black_points += settings.WIN
+                context.black_points += settings.WIN * settings.NUM_SIMULATIONS
             return
         if self.draw:
-            settings.white_points += settings.DRAW
-            settings.black_points += settings.DRAW
+            context.white_points += settings.DRAW * settings.NUM_SIMULATIONS
+            context.black_points += settings.DRAW * settings.NUM_SIMULATIONS
             return
-        white_can_castle, black_can_castle = copy.deepcopy(self.white_can_castle), copy.deepcopy(self.black_can_castle)
-        state = copy.deepcopy(self.state)
-        winner = mch.random_game(state, self.opp, white_can_castle, black_can_castle)
-        if not winner:
-            settings.black_points += settings.DRAW
-            settings.white_points += settings.DRAW
-        if winner == 'white':
-            settings.white_points += settings.WIN
-        if winner == 'black':
-            settings.black_points += settings.WIN
-
-    def roll_out(self):
-        """
-        Appends self to settings.walked_nodes and self.index to settings.path,
-        then calls self.simulate()
-        """
-        settings.walked_nodes.append(self)
-        settings.path.append(self.index)
+        match = self.position() if match is None else match
+        if context.deferred:
+            context.playout = (self, match)
+            return
+        winners = mch.random_games(match.state, self.opp, match.white_can_castle, match.black_can_castle,
+                                   settings.NUM_SIMULATIONS, pool=context.pool, fast=settings.FAST_PLAYOUTS,
+                                   batch=settings.BATCH_PLAYOUTS)
+        self.score(context, winners)
+
+    def score(self, context, winners):
+        """
+        Adds the points earned in games with given winners to context.white_points and context.black_points.
+        :param context: context of the search
+        :param winners: winner of every game, None for a draw
+        :type context: SearchContext
+        :type winners: list
+        """
+        for winner in winners:
+            if not winner:
+                context.black_points += settings.DRAW
+                context.white_points += settings.DRAW
+            if winner == 'white':
+                context.white_points += settings.WIN
+            if winner == 'black':
+                context.black_points += settings.WIN
+
+    def roll_out(self, context):
+        """
+        Materializes self, appends self to context.walked_nodes and self.index to context.path,
+        then calls self.simulate(), both from one replay of the position.
+        :param context: context of the search
+        :type context: SearchContext
+        """
+        match = self.position()
+        self.materialize(match)
+        context.walked_nodes.append(self)
+        context.path.append(self.index)
         self.visits += settings.VISITS
-        self.simulate()
+        self.simulate(context, match)
 
     def __str__(self):
         return self.branch_path
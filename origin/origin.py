@@ -1,10 +1,11 @@
 import database.database as database
+import database.writer as writer
 import settings
 from origin.node import Node
+from origin.context import SearchContext
 from chess.board import Board
 from math import sqrt, log
-from chess import chess_functions as cf
-import copy
+from chess.match import Match
 
 
 class Origin:
@@ -16,15 +17,16 @@ class Origin:
 
     def __init__(self):
         """
-        First calls settings.init_path_value(), then creates a starting board.
+        Creates a search context and a starting board.
         Attributes:
+             context = SearchContext()
              database = None
              state = Board().board
              nodes = []
              color = 'white'
              opp = 'black'
         """
-        settings.init_path_value()
+        self.context = SearchContext()
         self.database = None
         self.state = Board().board
         self.nodes = []
@@ -38,7 +40,7 @@ class Origin:
         :param user_color: user's side, either 'black' or 'white'
         :type state: str, tuple, list
         :type user_color: str
-        :return: returns the move with highest value and its piece respectively
+        :return: returns the piece and the location it moves to of the move with highest value
         :rtype: str, tuple
         """
         if type(state) == str:
@@ -56,101 +58,169 @@ class Origin:
                 values.append(node.value / node.visits)
             for i, v in enumerate(values):
                 if v == max(values):
-                    return self.nodes[i].piece, self.nodes[i].move
+                    move, key = self.position().decode_move(self.nodes[i].move)
+                    return key, move
         else:
             for node in self.nodes:
                 move_piece = node.get_best_move(state, num_pieces, user_color)
                 if move_piece:
                     return move_piece
 
+    def open_database(self, fn=r'C:\pythonprojects\chess_prod\database\nodes.db'):
+        """
+        Assigns database.Database(self, fn=fn) to self.database if database is not yet initialized, a
+        writer.Writer writing from a background thread instead if settings.ASYNC_SAVE.
+        :param fn: path to sqlite database file
+        :type fn: str
+        :return: self.database
+        :rtype: Database, Writer
+        """
+        if self.database is None:
+            self.database = writer.Writer(self, fn=fn) if settings.ASYNC_SAVE else database.Database(self, fn=fn)
+        return self.database
+
     def load(self, fn=r'C:\pythonprojects\chess_prod\database\nodes.db'):
         """
         Load database to self
         :param fn: path to database file
         :return:
         """
-        self.database = database.Database(self, fn=fn) if self.database is None else self.database
+        self.open_database(fn)
         self.database.load(self)
 
-    def save_walk(self, walked_nodes=settings.walked_nodes, fn=r'C:\pythonprojects\chess_prod\database\nodes.db'):
+    def save_walk(self, context=None, fn=r'C:\pythonprojects\chess_prod\database\nodes.db'):
         """
-        First assigns save.Database(self, fn=fn) to self.database if database is not yet initialized.
-        Saves last walk of tree to db: self.database.save_one_walk(walked_nodes).
+        First opens the database if not yet open, see self.open_database.
+        Buffers last walk of tree for the db: self.database.buffer_walk(context.walked_nodes, context), it is written
+        with the walks of the next rounds, see self.flush.
 
-        :param walked_nodes: list of nodes walked last training round, default is settings.walked_nodes
+        :param context: context of the last training round, default is self.context
         :param fn: path to sqlite database file
-        :type walked_nodes: list
+        :type context: SearchContext
         :type fn: str
         """
-        self.database = database.Database(self, fn=fn) if self.database is None else self.database
-        self.database.save_one_walk(walked_nodes)
+        context = self.context if context is None else context
+        self.open_database(fn)
+        self.database.buffer_walk(context.walked_nodes, context)
+
+    def flush(self):
+        """
+        Writes the walks buffered by self.save_walk to the db and waits for it, call at checkpoints and before
+        stopping training.
+        """
+        if self.database is not None:
+            self.database.flush()
 
-    def expand(self):
+    def close(self):
         """
-        Generates children nodes for each move available.
+        Writes the walks buffered by self.save_walk and closes the database, call when done training. A later save
+        or load opens it again.
         """
-        settings.init_tot_n()
-        moves, pieces = cf.get_moves_pieces(self.state, self.color, True, True, True, True)
-        index = 0
-        for key in moves:
+        if self.database is not None:
+            database, self.database = self.database, None
+            try:
+                database.flush()
+            finally:
+                database.close()
 
-            piece = pieces[key]
+    def save_stats(self, stats, fn=r'C:\pythonprojects\chess_prod\database\nodes.db'):
+        """
+        First opens the database if not yet open, see self.open_database.
+        Adds value and visits merged into nodes to db: self.database.save_nodes_stats(stats).
 
-            for move in moves[key]:
-                white_castle = {'ks': True,
-                                'qs': True}
-                black_castle = {'ks': True,
-                                'qs': True}
-                sim_board = copy.deepcopy(self.state)
-                branch = cf.get_branch(piece, move, sim_board, self.color)
-                self.nodes.append(Node(branch, self.color, move, key,
-                                       index, 'i' + str(index),
-                                       white_castle, black_castle))
-                index += 1
+        :param stats: (node, value, visits) for every node merged
+        :param fn: path to sqlite database file
+        :type stats: list
+        :type fn: str
+        """
+        self.open_database(fn)
+        self.database.save_nodes_stats(stats)
 
-    def update(self):
+    def position(self):
+        """
+        Returns a new Match in the starting position, replays of tree nodes start from it.
+        :rtype: Match
+        """
+        return Match(state=[row[:] for row in self.state], turn=self.color)
+
+    def child_branch_path(self, index):
+        """
+        Returns branch path of the child at given index of self.nodes.
+        :type index: int
+        :rtype: str
+        """
+        return 'i' + str(index)
+
+    def expand(self, context):
+        """
+        Generates a lazy child node for each move available.
+        :param context: context of the search, its total visits are reset
+        :type context: SearchContext
+        """
+        context.init_tot_n()
+        moves = self.position().legal_moves(self.color)
+        self.nodes = [Node(self, self.color, move, index) for index, move in enumerate(moves)]
+
+    def update(self, context):
         """
         Adds value of previous training round to this node's children node's value and calls update at that node.
+        :param context: context of the search
+        :type context: SearchContext
         """
         layer = 0
-        points = settings.white_points if self.color == 'white' else settings.black_points
-        ind = settings.path[layer]
+        points = context.white_points if self.color == 'white' else context.black_points
+        ind = context.path[layer]
         self.nodes[ind].value += points
-        if len(settings.path) - 1 > layer:
+        if len(context.path) - 1 > layer:
             layer += 1
-            self.nodes[ind].update(layer)
+            self.nodes[ind].update(layer, context)
         else:
             return
 
-    def train(self):
+    def train(self, context=None):
         """
-        Chooses child to train. Calls self.update first if self trained previous round and calls self.expand if we don't
-        have child nodes yet. If all child nodes have been visited at least once, we compute the priority of node with:
-        UCB1(node) = (node.value / node.visits) + (self.C * sqrt(ln(settings.tot_n) / node.visits)
-        Then train the node which maximizes the UCB1 function and add settings.VISITS to settings.tot_n
+        Trains one round: self.select(context) followed by self.backup(context).
+        :param context: context of the search, default is self.context
+        :type context: SearchContext
         """
-        settings.walked_nodes = []
-        settings.init_path_value()
+        context = self.context if context is None else context
+        self.select(context)
+        self.backup(context)
+
+    def select(self, context):
+        """
+        Chooses child to train. Calls self.expand if we don't have child nodes yet.
+        If all child nodes have been visited at least once, we compute the priority of node with:
+        UCB1(node) = (node.value / node.visits) + (self.C * sqrt(ln(context.tot_n) / node.visits)
+        Then train the node which maximizes the UCB1 function.
+        :param context: context of the search, its path and points are reset first
+        :type context: SearchContext
+        """
+        context.init_path_value()
         if not self.nodes:
-            self.expand()
-            self.nodes[0].roll_out()
-            settings.tot_n += settings.VISITS
-            self.update()
+            self.expand(context)
+            self.nodes[0].roll_out(context)
             return
         values = []
         for node in self.nodes:
             if node.visits == 0:
-                node.roll_out()
-                settings.tot_n += settings.VISITS
-                self.update()
+                node.roll_out(context)
                 return
             val_1 = node.value / node.visits
-            val_2 = self.C * sqrt(log(settings.tot_n) / node.visits)
+            val_2 = self.C * sqrt(log(context.tot_n) / node.visits)
             values.append(val_1 + val_2)
         hi_value = max(values)
         for i, v in enumerate(values):
             if v == hi_value:
-                self.nodes[i].train()
-                settings.tot_n += settings.VISITS
-                self.update()
+                self.nodes[i].train(context)
                 return
+
+    def backup(self, context):
+        """
+        Adds settings.VISITS to context.tot_n and the points of the round selected in given context to the
+        walked nodes, see self.update.
+        :param context: context of the search
+        :type context: SearchContext
+        """
+        context.tot_n += settings.VISITS
+        self.update(context)
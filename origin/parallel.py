@@ -0,0 +1,231 @@
+"""
+Parallel training. Root parallel: every worker process grows its own tree from Origin(), the value and visits its
+root's children gain are periodically merged into the master tree. Leaf parallel: the games of a roll out are
+played by the workers of a playout_pool. Tree parallel: several descents of one tree are in flight at once, their
+games are played by worker processes.
+"""
+import random
+from collections import deque
+from multiprocessing import Pool
+
+import settings
+from chess.match import random_games
+from origin.context import SearchContext
+from origin.origin import Origin
+
+_origin = None
+_reported = {}
+
+
+def _init_worker():
+    """
+    Creates the tree of a worker process and reseeds random, forked workers would otherwise play the same games.
+    """
+    global _origin
+    random.seed()
+    _origin = Origin()
+    _reported.clear()
+
+
+def _seed_worker():
+    """
+    Reseeds random of a worker process, forked workers would otherwise play the same games.
+    """
+    random.seed()
+
+
+def playout_pool(processes):
+    """
+    Returns a process pool for leaf parallel roll outs, assign it to SearchContext.pool. The pool plays the
+    settings.NUM_SIMULATIONS games of each roll out.
+    :param processes: amount of worker processes
+    :type processes: int
+    :rtype: multiprocessing.pool.Pool
+    """
+    return Pool(processes, initializer=_seed_worker)
+
+
+def _train_worker(rounds):
+    """
+    Trains the tree of this worker process and returns what its root's children gained since the previous call.
+    :param rounds: amount of training rounds
+    :type rounds: int
+    :return: (index, move, value, visits) for every root child which was visited
+    :rtype: list
+    """
+    for rnd in range(rounds):
+        _origin.train()
+    deltas = []
+    for node in _origin.nodes:
+        value, visits = _reported.get(node.index, (0, 0))
+        if node.visits != visits:
+            deltas.append((node.index, node.move, node.value - value, node.visits - visits))
+            _reported[node.index] = (node.value, node.visits)
+    return deltas
+
+
+class RootParallel:
+    """
+    Trains a master tree with a pool of worker processes which each grow their own tree. Use as context manager
+    or call close() to stop the workers.
+    """
+    def __init__(self, origin, processes, rounds=50):
+        """
+        Starts the worker processes.
+        :param origin: master tree, receives the merged statistics of its children
+        :param processes: amount of worker processes
+        :param rounds: training rounds per worker between two merges
+        :type origin: Origin
+        :type processes: int
+        :type rounds: int
+        """
+        self.origin = origin
+        self.processes = processes
+        self.rounds = rounds
+        self.pool = Pool(processes, initializer=_init_worker)
+
+    def train(self, sync=False):
+        """
+        Lets every worker train self.rounds rounds and merges their results into the master tree.
+        :param sync: saves the merged statistics to the origin's database if True
+        :type sync: bool
+        :return: nodes, value and visits merged
+        :rtype: list
+        """
+        stats = {}
+        for deltas in self.pool.imap_unordered(_train_worker, [self.rounds] * self.processes):
+            for node, value, visits in self.merge(deltas):
+                total = stats.get(node.index, (node, 0, 0))
+                stats[node.index] = (node, total[1] + value, total[2] + visits)
+        stats = list(stats.values())
+        if sync:
+            self.origin.save_stats(stats)
+        return stats
+
+    def merge(self, deltas):
+        """
+        Adds value and visits of one worker's root children to the master tree's children.
+        :param deltas: (index, move, value, visits) as returned by a worker
+        :type deltas: list
+        :return: nodes, value and visits merged
+        :rtype: list
+        """
+        origin = self.origin
+        if not origin.nodes:
+            origin.expand(origin.context)
+        merged = []
+        for index, move, value, visits in deltas:
+            node = origin.nodes[index]
+            if node.move != move:
+                raise ValueError('worker child {} does not match master child {}'.format(move, node.move))
+            node.value += value
+            node.visits += visits
+            origin.context.tot_n += visits
+            merged.append((node, value, visits))
+        return merged
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TreeParallel:
+    """
+    Trains one tree with as many descents in flight as there are worker processes. A descent selects its path in
+    this process and leaves its games to a worker, until the games are backed up every node on the path carries a
+    virtual loss so the next descents prefer other paths. Use as context manager or call close() to stop the workers.
+    """
+    def __init__(self, origin, processes, virtual_loss=settings.VIRTUAL_LOSS):
+        """
+        Starts the worker processes.
+        :param origin: tree to train
+        :param processes: amount of worker processes and of descents in flight
+        :param virtual_loss: value subtracted from every node on the path of a descent in flight
+        :type origin: Origin
+        :type processes: int
+        :type virtual_loss: float
+        """
+        self.origin = origin
+        self.processes = processes
+        self.virtual_loss = virtual_loss
+        self.pool = Pool(processes, initializer=_seed_worker)
+        self.in_flight = deque()
+
+    def descend(self):
+        """
+        Selects a path in a new context, applies the virtual loss to it and sends its games to a worker.
+        Visits and self.origin.context.tot_n are counted right away like in Origin.train.
+        :return: context of the descent and result of its games, None if it ended in a terminal node
+        :rtype: tuple
+        """
+        context = SearchContext(tot_n=self.origin.context.tot_n)
+        context.deferred = True
+        self.origin.select(context)
+        self.origin.context.tot_n += settings.VISITS
+        for node in context.walked_nodes:
+            node.value -= self.virtual_loss
+        result = None
+        if context.playout is not None:
+            node, match = context.playout
+            result = self.pool.apply_async(random_games, (match.state, node.opp, match.white_can_castle,
+                                                          match.black_can_castle, settings.NUM_SIMULATIONS),
+                                           {'fast': settings.FAST_PLAYOUTS, 'batch': settings.BATCH_PLAYOUTS})
+        return context, result
+
+    def finish(self, context, result, sync=False):
+        """
+        Waits for the games of a descent, removes its virtual loss and backs up its points.
+        :param context: context of the descent
+        :param result: result of its games as returned by self.descend()
+        :param sync: saves the walk of the descent to the origin's database if True
+        :type context: SearchContext
+        :type result: multiprocessing.pool.AsyncResult, None
+        :type sync: bool
+        """
+        for node in context.walked_nodes:
+            node.value += self.virtual_loss
+        if result is not None:
+            context.playout[0].score(context, result.get())
+        self.origin.update(context)
+        if sync:
+            self.origin.save_walk(context)
+
+    def train(self, n, sync=False):
+        """
+        Trains n rounds, keeping self.processes descents in flight.
+        :param n: amount of training rounds
+        :param sync: saves every walk started by this call to the origin's database if True, also those still in
+                     flight after it
+        :type n: int
+        :type sync: bool
+        """
+        for rnd in range(n):
+            while len(self.in_flight) < self.processes:
+                self.in_flight.append(self.descend() + (sync, ))
+            self.finish(*self.in_flight.popleft())
+
+    def close(self):
+        """
+        Backs up the descents still in flight, saving their walks if the train call that started them did, writes
+        the walks buffered for the origin's database and stops the worker processes.
+        """
+        while self.in_flight:
+            self.finish(*self.in_flight.popleft())
+        self.origin.flush()
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
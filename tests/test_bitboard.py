@@ -0,0 +1,22 @@
+import pytest
+
+from chess.bitboard import Bitboard
+from chess.moves import load_fen
+from chess.perft import KNOWN_COUNTS
+
+FENS = [' '.join(fen.split(' ')[:3]) for fen, counts in KNOWN_COUNTS]
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_fen_round_trip(fen):
+    assert Bitboard.from_fen(fen).to_fen() == fen
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_from_fen_matches_load_fen(fen):
+    board, turn = load_fen(fen)
+    castling = fen.split(' ')[2]
+    bb = Bitboard.from_board(board, turn, 'K' in castling, 'Q' in castling, 'k' in castling, 'q' in castling)
+    from_fen = Bitboard.from_fen(fen)
+    assert (from_fen.pieces, from_fen.colors, from_fen.turn) == (bb.pieces, bb.colors, bb.turn)
+    assert (from_fen.white_can_castle, from_fen.black_can_castle) == (bb.white_can_castle, bb.black_can_castle)
@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+from chess.board import Board
+from chess.match import Match
+from chess.moves import CASTLE, move_from, move_to
+from database.database import Database
+from database.queries import SCHEMA_VERSION, NODES_COLUMNS
+from origin.origin import Origin
+
+# (color, piece, location moved to) of the moves of one line, the first move is played from the start position
+LINE = (
+    ('white', 'P5', (4, 4)),
+    ('black', 'P5', (3, 4)),
+    ('white', 'N2', (5, 5)),
+    ('black', 'N1', (2, 2)),
+    ('white', 'B2', (4, 2)),
+    ('black', 'B2', (3, 2)),
+    ('white', 'K', (7, 6)),
+)
+
+
+def baseline_db(fn, line=LINE):
+    """
+    Writes given line to fn as the baseline code saved trees: the board after the move, the location moved to as
+    text and the piece moved, with a second child of the root for 'P4' to (4, 3).
+    :return: board stored by every row by (table, node_id)
+    :rtype: dict
+    """
+    conn = sqlite3.connect(fn)
+    for tbn in ('white_nodes', 'black_nodes'):
+        conn.execute("""CREATE TABLE {tbn}
+                        (
+                          node_id         INTEGER not null
+                            primary key autoincrement,
+                          board           VARCHAR [350],
+                          move            VARCHAR [6],
+                          piece           VARCHAR [3],
+                          ind             INT,
+                          this_can_castle VARCHAR[27],
+                          next_can_castle VARCHAR[27],
+                          value           INT,
+                          visits          INT,
+                          branch_path     VARCHAR[200] UNIQUE,
+                          parent_id       INTEGER
+                        )""".format(tbn=tbn))
+    boards = {}
+    for ind, moves in ((0, line), (1, (('white', 'P4', (4, 3)), ))):
+        match = Match(state=[row[:] for row in Board().board])
+        parent_id, branch_path = None, ''
+        for color, piece, to_loc in moves:
+            match.make_move(to_loc, piece)
+            tbn = '{}_nodes'.format(color)
+            branch_path += 's{}'.format(ind)
+            node_id = conn.execute('INSERT INTO {} VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'.format(tbn),
+                                   (repr(match.state), repr(to_loc), piece, ind, '{}', '{}', 1, 1, branch_path,
+                                    parent_id)).lastrowid
+            boards[(tbn, node_id)] = [row[:] for row in match.state]
+            parent_id, ind = node_id, 0
+    conn.commit()
+    conn.close()
+    return boards
+
+
+def test_baseline_tree_is_migrated(tmp_path):
+    fn = str(tmp_path / 'nodes.db')
+    boards = baseline_db(fn)
+    origin = Origin()
+    database = Database(origin, fn=fn)
+    database.load(origin)
+    assert database.get_columns('white_nodes') == [column.strip() for column in NODES_COLUMNS.split(',')]
+    assert database.conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    nodes, stack = [], list(origin.nodes)
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.nodes)
+    assert len(nodes) == len(boards)
+    for node in nodes:
+        assert node.position().state == boards[('{}_nodes'.format(node.color), node.db_id)]
+    castle = next(node for node in nodes if node.move & CASTLE)
+    assert (move_from(castle.move), move_to(castle.move)) == ((7, 4), (7, 6))
+    database.close()
+
+
+def test_unpackable_tree_is_left_unchanged(tmp_path):
+    fn = str(tmp_path / 'nodes.db')
+    baseline_db(fn, LINE[:2])
+    conn = sqlite3.connect(fn)
+    conn.execute("UPDATE black_nodes SET piece = 'Q9'")
+    conn.commit()
+    conn.close()
+    with open(fn, 'rb') as f:
+        before = f.read()
+    with pytest.raises(ValueError):
+        Database(Origin(), fn=fn)
+    with open(fn, 'rb') as f:
+        assert f.read() == before
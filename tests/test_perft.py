@@ -0,0 +1,29 @@
+import pytest
+
+from chess.perft import KNOWN_COUNTS, START_FEN, match_from_fen, perft, divide, verify
+
+CASES = [(fen, depth, expected) for fen, counts in KNOWN_COUNTS for depth, expected in enumerate(counts, 1)]
+
+
+@pytest.mark.parametrize('fen, depth, expected', CASES)
+def test_known_counts(fen, depth, expected):
+    assert perft(match_from_fen(fen), depth) == expected
+
+
+def test_perft_restores_match():
+    match = match_from_fen(KNOWN_COUNTS[2][0])
+    before = [row[:] for row in match.state], match.turn, sorted(match.legal_moves())
+    perft(match, 2)
+    assert ([row[:] for row in match.state], match.turn, sorted(match.legal_moves())) == before
+
+
+def test_divide_sums_to_perft():
+    result = divide(match_from_fen(START_FEN), 2)
+    assert len(result) == 20
+    assert sum(leaves for from_loc, to_loc, leaves in result) == 400
+
+
+def test_verify_reports_wrong_counts(monkeypatch):
+    monkeypatch.setattr('chess.perft.KNOWN_COUNTS', ((START_FEN, (20, 401)), ))
+    assert verify() == [(START_FEN, 2, 401, 400)]
+    assert verify(1) == []